@@ -0,0 +1,58 @@
+"""Per-call overhead of ``db`` helpers with and without connection reuse.
+
+Times ``db.data_version()`` (one tiny query) and ``db.record_rating`` with
+the pool disabled, which opens a connection and re-runs the WAL pragma per
+call as before, and with pooled connections. Usage::
+
+    python benchmarks/db_connection.py [-n 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from curator import db  # noqa: E402
+
+
+def _per_call(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5000, help="calls per run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        db.init_db(path)
+        db.insert_item("bench", "t", "d", 1, "u", db_path=path)
+        calls = {
+            "data_version": lambda: db.data_version(db_path=path),
+            "record_rating": lambda: db.record_rating("bench", 5, db_path=path),
+        }
+        pool_size = db.POOL_SIZE
+        for name, fn in calls.items():
+            db.POOL_SIZE = 0
+            db.close_connections()
+            fresh = _per_call(fn, args.n)
+            db.POOL_SIZE = pool_size
+            pooled = _per_call(fn, args.n)
+            print(
+                f"{name:>13}: fresh {1e6 * fresh:8.1f} us  "
+                f"pooled {1e6 * pooled:8.1f} us  ({fresh / pooled:4.1f}x)"
+            )
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Time back-filling items one by one vs through ``db.insert_items``.
+
+Inserts ``-n`` synthetic items into a fresh DB, then upserts them again to
+measure the update path. Usage::
+
+    python benchmarks/db_insert.py [-n 100000] [--single 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from curator import db  # noqa: E402
+
+
+def _rows(n: int, prefix: str):
+    return [
+        (f"{prefix}{i}", f"title {i}", f"description {i}", i % 3600, f"url{i}", None, i)
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=100_000, help="bulk rows")
+    parser.add_argument(
+        "--single", type=int, default=5000, help="rows for the per-item baseline"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        db.init_db(path)
+
+        start = time.perf_counter()
+        for row in _rows(args.single, "single"):
+            db.insert_item(*row, db_path=path)
+        single = time.perf_counter() - start
+        print(
+            f"insert_item  : {args.single:>7} rows in {single:6.2f} s "
+            f"({args.single / single:8.0f} rows/s)"
+        )
+
+        rows = _rows(args.n, "bulk")
+        for label in ("insert_items", "re-upsert   "):
+            start = time.perf_counter()
+            db.insert_items(rows, db_path=path)
+            took = time.perf_counter() - start
+            print(
+                f"{label} : {args.n:>7} rows in {took:6.2f} s "
+                f"({args.n / took:8.0f} rows/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Write and read throughput of the ``safe`` and ``performance`` SQLite profiles.
+
+For each profile, builds a catalog of ``-n`` items, then times single-row
+committed writes (``db.record_rating``, as the web UI issues them) and random
+reads (an item with its rating stats, plus a search page). The ``performance``
+run also starts the background checkpointer, so its commit latency excludes
+WAL checkpoints. Usage::
+
+    python benchmarks/db_profile.py [-n 200000] [-w 3000] [-r 20000] [-d DIR]
+
+Pass ``-d`` to run on a real disk if the temp directory is a tmpfs, where
+fsync costs nothing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from curator import db  # noqa: E402
+from curator.checkpoint import Checkpointer  # noqa: E402
+
+WORDS = [f"w{i}" for i in range(5000)]
+
+
+def _catalog(n: int, rng: random.Random):
+    for i in range(n):
+        title = " ".join(rng.choices(WORDS, k=4))
+        description = " ".join(rng.choices(WORDS, k=60))
+        yield (f"id{i}", title, description, 60, f"url{i}")
+
+
+def _run(profile: str, args, rng: random.Random) -> None:
+    db.configure(profile)
+    with tempfile.TemporaryDirectory(dir=args.d) as tmp:
+        path = Path(tmp) / "bench.db"
+        db.init_db(path)
+        rows = list(_catalog(args.n, rng))
+        for i in range(0, len(rows), 50_000):
+            db.insert_items(rows[i : i + 50_000], db_path=path)
+        db.close_connections()  # start reads from a cold page cache
+
+        checkpointer = None
+        if profile == "performance":
+            checkpointer = Checkpointer(path, interval=1.0).start()
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(args.w):
+            begin = time.perf_counter()
+            db.record_rating(f"id{rng.randrange(args.n)}", rng.randint(1, 10), db_path=path)
+            latencies.append(time.perf_counter() - begin)
+        writes = args.w / (time.perf_counter() - start)
+        if checkpointer is not None:
+            checkpointer.stop()
+
+        start = time.perf_counter()
+        with db.get_connection(path) as conn:
+            for _ in range(args.r):
+                conn.execute(
+                    "SELECT i.*, s.mean FROM items i"
+                    " LEFT JOIN rating_stats s ON s.item_id = i.id WHERE i.id = ?",
+                    (f"id{rng.randrange(args.n)}",),
+                ).fetchone()
+        reads = args.r / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        searches = max(1, args.r // 100)
+        for _ in range(searches):
+            db.search_items(rng.choice(WORDS), limit=20, db_path=path)
+        search_rate = searches / (time.perf_counter() - start)
+
+        latencies.sort()
+        print(
+            f"{profile:>11}: {writes:8.0f} writes/s "
+            f"(p50 {1000 * statistics.median(latencies):.2f} ms, "
+            f"p99 {1000 * latencies[int(len(latencies) * 0.99)]:.2f} ms, "
+            f"max {1000 * latencies[-1]:.1f} ms)  "
+            f"{reads:8.0f} lookups/s  {search_rate:6.1f} searches/s"
+        )
+        db.close_connections()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=200_000, help="catalog size")
+    parser.add_argument("-w", type=int, default=3000, help="committed writes")
+    parser.add_argument("-r", type=int, default=20_000, help="point lookups")
+    parser.add_argument("-d", default=None, help="directory for the database")
+    args = parser.parse_args()
+
+    for profile in ("safe", "performance"):
+        _run(profile, args, random.Random(0))
+    db.configure(db.DEFAULT_PROFILE)
+
+
+if __name__ == "__main__":
+    main()
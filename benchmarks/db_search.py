@@ -0,0 +1,88 @@
+"""Latency of ``db.search_items`` against a ``LIKE`` scan on a large catalog.
+
+Builds a synthetic catalog of ``-n`` items with Zipf-distributed words,
+then times first-page queries for rare to very common words. Usage::
+
+    python benchmarks/db_search.py [-n 1000000] [-q 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from curator import db  # noqa: E402
+
+VOCABULARY = 20_000
+
+
+def _catalog(n: int, rng: random.Random):
+    # Word frequencies follow Zipf's law like real titles and descriptions
+    words = [f"w{rank}" for rank in range(1, VOCABULARY + 1)]
+    cum = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY + 1)))
+    for i in range(n):
+        title = " ".join(rng.choices(words, cum_weights=cum, k=4))
+        description = " ".join(rng.choices(words, cum_weights=cum, k=30))
+        yield (f"id{i}", title, description, 60, f"url{i}")
+
+
+def _time(fn, runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=1_000_000, help="catalog size")
+    parser.add_argument("-q", type=int, default=20, help="queries per run")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        db.init_db(path)
+        start = time.perf_counter()
+        rows = list(_catalog(args.n, rng))
+        for i in range(0, len(rows), 100_000):
+            db.insert_items(rows[i : i + 100_000], db_path=path)
+        print(f"indexed {args.n} items in {time.perf_counter() - start:.1f} s")
+
+        queries = {
+            "rare word": "w5000",
+            "mid word": "w100",
+            "top word": "w1",
+            "two words": "w20 w300",
+            "prefix": "w99",
+        }
+        for label, text in queries.items():
+            fts = _time(lambda: db.search_items(text, limit=20, db_path=path), args.q)
+            with db.get_connection(path) as conn:
+                # Without an index every match has to be found before ranking
+                like = _time(
+                    lambda: conn.execute(
+                        "SELECT id FROM items WHERE title LIKE ? OR description LIKE ?",
+                        (f"%{text}%", f"%{text}%"),
+                    ).fetchall(),
+                    max(1, args.q // 10),
+                )
+            print(
+                f"{label:>10}: fts p50 {1000 * statistics.median(fts):8.2f} ms  "
+                f"like p50 {1000 * statistics.median(like):8.2f} ms"
+            )
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Throughput and CPU cost of the download writer, before and after.
+
+Serves a generated file from a local HTTP server and streams it to disk:
+
+* ``before``   - ``iter_content(8192)`` into ``f.write`` (the original loop)
+* ``after``    - ``StreamWriter`` with ``download_chunk_kb`` blocks
+* ``after+sha1`` - the same with the sha1 computed on the hashing thread
+
+The server runs in a subprocess so CPU time is the client's alone.
+
+Usage::
+
+    python benchmarks/download_writer.py [--mb 512] [--chunk-kb 1024]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import requests  # noqa: E402
+
+from curator.writer import StreamWriter, preallocate  # noqa: E402
+
+
+def _serve(directory: str) -> tuple[subprocess.Popen, int]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "http.server", str(port), "-b", "127.0.0.1", "-d", directory],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return server, port
+
+
+def before(url: str, dst: Path, chunk_kb: int, size: int) -> None:
+    with requests.get(url, stream=True) as r, dst.open("wb") as f:
+        for chunk in r.iter_content(chunk_size=8192):
+            if chunk:
+                f.write(chunk)
+
+
+def after(url: str, dst: Path, chunk_kb: int, size: int, hashers=()) -> None:
+    with requests.get(url, stream=True) as r, dst.open("wb") as f:
+        preallocate(f, 0, size)
+        StreamWriter(f, chunk_kb * 1024, hashers).copy(r)
+
+
+def after_sha1(url: str, dst: Path, chunk_kb: int, size: int) -> None:
+    after(url, dst, chunk_kb, size, [hashlib.sha1()])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=512, help="file size in MiB")
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "video.bin"
+        with src.open("wb") as f:
+            block = bytes(range(256)) * 4096
+            for _ in range(args.mb):
+                f.write(block)
+        size = src.stat().st_size
+        server, port = _serve(tmp)
+        url = f"http://127.0.0.1:{port}/video.bin"
+        gb = size / 1024**3
+        runs = (("before", before), ("after", after), ("after+sha1", after_sha1))
+        for name, fn in runs:
+            best_wall = best_cpu = float("inf")
+            for _ in range(args.runs):
+                dst = Path(tmp) / f"{name}.out"
+                wall, cpu = time.perf_counter(), time.process_time()
+                fn(url, dst, args.chunk_kb, size)
+                best_wall = min(best_wall, time.perf_counter() - wall)
+                best_cpu = min(best_cpu, time.process_time() - cpu)
+                dst.unlink()
+            print(
+                f"{name:>10}: {size / 1024**2 / best_wall:8.1f} MB/s  "
+                f"{best_cpu / gb:6.2f} CPU s/GB"
+            )
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare per-request latency of fresh connections vs the pooled session.
+
+Fetches ``/metadata`` for a day's worth of identifiers twice: once with a
+new connection per call (the old ``requests.get`` behaviour) and once via
+``curator.session``. Usage::
+
+    python benchmarks/http_pool.py [--base https://archive.org] [-n 30] id ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import requests  # noqa: E402
+
+from curator import session  # noqa: E402
+from curator.config import Config  # noqa: E402
+from curator.fetch import HEADERS  # noqa: E402
+
+
+def _timed(get, urls, timeout):
+    samples = []
+    for url in urls:
+        start = time.perf_counter()
+        get(url, timeout=timeout, headers=HEADERS).content
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base", default="https://archive.org")
+    parser.add_argument("-n", type=int, default=30, help="requests per run")
+    parser.add_argument("ids", nargs="*", default=["nasa"])
+    args = parser.parse_args()
+
+    urls = [
+        f"{args.base}/metadata/{args.ids[i % len(args.ids)]}" for i in range(args.n)
+    ]
+    cfg = Config()
+    runs = {
+        "fresh": _timed(requests.get, urls, cfg.timeout),
+        "pooled": _timed(session.get_session(cfg).get, urls, cfg.timeout),
+    }
+    for name, samples in runs.items():
+        print(
+            f"{name:>6}: mean {1000 * statistics.mean(samples):7.1f} ms  "
+            f"p50 {1000 * statistics.median(samples):7.1f} ms  "
+            f"total {sum(samples):6.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index over item vectors.
+
+The index partitions normalized vectors into ``nlist`` clusters with
+spherical k-means. A query scores the centroids, probes the ``nprobe``
+closest clusters and ranks only their members exactly, so ``nprobe`` trades
+recall for latency.
+
+On disk the index is a directory next to the SQLite DB holding ``.npy``
+arrays that are memory-mapped on load, so a search only pages in the probed
+clusters. Vectors added after training go to a small delta segment which is
+folded into the main arrays once it grows past ``COMPACT_RATIO``. An id in
+the delta segment supersedes its entry in the main lists, so a re-embedded
+item is never scored with its old vector. Until a compaction rewrites the
+main lists, saving only rewrites ``delta.npz``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import logging
+
+import numpy as np
+
+from . import db
+
+
+logger = logging.getLogger(__name__)
+
+# Fold the delta segment into the main lists beyond this fraction of its size
+COMPACT_RATIO = 0.05
+# Vectors sampled per cluster (and in total) for k-means training
+TRAIN_PER_LIST = 32
+TRAIN_SAMPLE = 65_536
+_CHUNK = 65_536
+
+
+def index_path(db_path: Optional[Path] = None) -> Path:
+    """Return the index directory that sits next to ``db_path``."""
+    return Path(db_path or db.DB_PATH).with_suffix(".ivf")
+
+
+def _default_nlist(size: int) -> int:
+    return max(1, min(int(np.sqrt(size)), size))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the nearest centroid for each row, in bounded-size chunks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _CHUNK):
+        block = vectors[start : start + _CHUNK]
+        out[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(
+    vectors: np.ndarray, nlist: int, iterations: int, seed: int
+) -> np.ndarray:
+    """Return ``nlist`` unit-norm centroids trained on ``vectors``."""
+    rng = np.random.default_rng(seed)
+    sample = min(TRAIN_SAMPLE, max(nlist * TRAIN_PER_LIST, nlist))
+    if len(vectors) > sample:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters from random members
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms == 0, 1.0, norms)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """IVF index mapping item ids to float32 vectors."""
+
+    def __init__(
+        self,
+        model: str,
+        centroids: np.ndarray,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        offsets: np.ndarray,
+        delta_ids: Optional[np.ndarray] = None,
+        delta_vectors: Optional[np.ndarray] = None,
+        delta_lists: Optional[np.ndarray] = None,
+        trained_size: Optional[int] = None,
+        generation: Optional[str] = None,
+    ) -> None:
+        dim = centroids.shape[1]
+        self.model = model
+        self.centroids = centroids
+        self.ids = ids
+        self.vectors = vectors
+        self.offsets = offsets
+        self.delta_ids = delta_ids if delta_ids is not None else np.zeros(0, dtype=str)
+        self.delta_vectors = (
+            delta_vectors
+            if delta_vectors is not None
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        self.delta_lists = (
+            delta_lists if delta_lists is not None else np.zeros(0, dtype=np.int32)
+        )
+        self.trained_size = trained_size if trained_size is not None else len(ids)
+        # Identifies the main lists on disk; ``None`` until they are saved
+        self.generation = generation
+
+    def __len__(self) -> int:
+        return int((~self._superseded()).sum()) + len(self.delta_ids)
+
+    def _superseded(self) -> np.ndarray:
+        """Mask of main-list entries replaced by a delta entry."""
+        if not len(self.delta_ids):
+            return np.zeros(len(self.ids), dtype=bool)
+        return np.isin(self.ids, self.delta_ids)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(
+        cls,
+        model: str,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        nlist: int = 0,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Cluster ``vectors`` and return a populated index."""
+        nlist = min(nlist or _default_nlist(len(vectors)), len(vectors))
+        centroids = _kmeans(vectors, nlist, iterations, seed)
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        logger.info("[i] trained IVF index: %d vectors, %d lists", len(ids), nlist)
+        return cls(
+            model,
+            centroids,
+            np.asarray(ids)[order],
+            np.ascontiguousarray(vectors[order], dtype=np.float32),
+            offsets,
+        )
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Add or replace vectors in the delta segment, compacting when it grows."""
+        if not len(ids):
+            return
+        ids = np.asarray(ids)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # Keep the last vector per id, here and over earlier delta entries
+        _, last = np.unique(ids[::-1], return_index=True)
+        keep = np.sort(len(ids) - 1 - last)
+        ids, vectors = ids[keep], vectors[keep]
+        old = ~np.isin(self.delta_ids, ids)
+        self.delta_ids = np.concatenate((self.delta_ids[old], ids))
+        self.delta_vectors = np.vstack((self.delta_vectors[old], vectors))
+        self.delta_lists = np.concatenate(
+            (self.delta_lists[old], _assign(vectors, self.centroids))
+        )
+        if len(self.delta_ids) > COMPACT_RATIO * max(len(self.ids), 1):
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge the delta segment into the main inverted lists."""
+        if not len(self.delta_ids):
+            return
+        live = ~self._superseded()
+        main_lists = np.repeat(
+            np.arange(self.nlist, dtype=np.int32), np.diff(self.offsets)
+        )[live]
+        labels = np.concatenate((main_lists, self.delta_lists))
+        order = np.argsort(labels, kind="stable")
+        self.ids = np.concatenate((self.ids[live], self.delta_ids))[order]
+        self.vectors = np.vstack((self.vectors[live], self.delta_vectors))[order]
+        counts = np.bincount(labels, minlength=self.nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.delta_ids = self.delta_ids[:0]
+        self.delta_vectors = self.delta_vectors[:0]
+        self.delta_lists = self.delta_lists[:0]
+        self.generation = None
+        logger.debug("compacted IVF index to %d vectors", len(self.ids))
+
+    def search(
+        self, query: np.ndarray, top_n: int, nprobe: int = 8
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(ids, scores)`` of the best ``top_n`` matches for ``query``."""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = max(1, min(nprobe, self.nlist))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        ids = [self.ids[self.offsets[i] : self.offsets[i + 1]] for i in probe]
+        vecs = [self.vectors[self.offsets[i] : self.offsets[i + 1]] for i in probe]
+        cand_ids = np.concatenate(ids)
+        scores = np.vstack(vecs) @ query
+        if len(self.delta_ids):
+            live = ~np.isin(cand_ids, self.delta_ids)
+            mask = np.isin(self.delta_lists, probe)
+            cand_ids = np.concatenate((cand_ids[live], self.delta_ids[mask]))
+            scores = np.concatenate(
+                (scores[live], self.delta_vectors[mask] @ query)
+            )
+        if not len(cand_ids):
+            return cand_ids, np.zeros(0, dtype=np.float32)
+
+        k = min(top_n, len(scores))
+        if k <= 0:
+            return cand_ids[:0], scores[:0]
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return cand_ids[best], scores[best]
+
+    def save(self, path: Path) -> None:
+        """Write the index to ``path`` atomically.
+
+        When ``path`` already holds these main lists only the delta segment
+        is rewritten, so adding a few items costs no more than the delta.
+        """
+        meta_path = path / "meta.json"
+        if self.generation is not None and meta_path.is_file():
+            if json.loads(meta_path.read_text()).get("generation") == self.generation:
+                self._save_delta(path)
+                return
+        generation = uuid.uuid4().hex
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        arrays = {
+            "centroids": self.centroids,
+            "ids": self.ids,
+            "vectors": self.vectors,
+            "offsets": self.offsets,
+        }
+        for name, arr in arrays.items():
+            np.save(tmp / f"{name}.npy", np.asarray(arr), allow_pickle=False)
+        self.generation = generation
+        self._save_delta(tmp)
+        meta = {
+            "model": self.model,
+            "trained_size": self.trained_size,
+            "generation": generation,
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta))
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def _save_delta(self, path: Path) -> None:
+        tmp = path / "delta.npz.tmp"
+        with tmp.open("wb") as f:
+            np.savez(
+                f,
+                generation=np.array(self.generation),
+                ids=np.asarray(self.delta_ids),
+                vectors=np.asarray(self.delta_vectors),
+                lists=np.asarray(self.delta_lists),
+            )
+        os.replace(tmp, path / "delta.npz")
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        """Load an index saved with :meth:`save`, memory-mapping the lists."""
+        meta = json.loads((path / "meta.json").read_text())
+
+        def arr(name: str, mmap: bool = False) -> np.ndarray:
+            return np.load(
+                path / f"{name}.npy",
+                mmap_mode="r" if mmap else None,
+                allow_pickle=False,
+            )
+
+        delta = {}
+        if (path / "delta.npz").is_file():
+            with np.load(path / "delta.npz", allow_pickle=False) as npz:
+                if str(npz["generation"]) == meta.get("generation"):
+                    delta = {
+                        "delta_ids": npz["ids"],
+                        "delta_vectors": npz["vectors"],
+                        "delta_lists": npz["lists"],
+                    }
+        return cls(
+            meta["model"],
+            arr("centroids"),
+            arr("ids", mmap=True),
+            arr("vectors", mmap=True),
+            arr("offsets"),
+            trained_size=meta["trained_size"],
+            generation=meta.get("generation"),
+            **delta,
+        )
+
+
+def load_index(model: str, db_path: Optional[Path] = None) -> Optional[IVFIndex]:
+    """Return the stored index for ``model`` or ``None`` if absent or stale."""
+    path = index_path(db_path)
+    if not (path / "meta.json").is_file():
+        return None
+    index = IVFIndex.load(path)
+    if index.model != model:
+        logger.info("[i] ignoring IVF index built for %s", index.model)
+        return None
+    return index
+
+
+def drop_index(db_path: Optional[Path] = None) -> None:
+    """Delete the stored index, if any."""
+    shutil.rmtree(index_path(db_path), ignore_errors=True)
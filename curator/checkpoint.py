@@ -0,0 +1,113 @@
+"""Background WAL checkpoints, kept off the request path.
+
+SQLite's automatic checkpoint runs inside whichever commit pushes the WAL past
+``wal_autocheckpoint`` pages, so one unlucky writer pays for copying the whole
+log back. The checkpointer runs a ``PASSIVE`` checkpoint on a timer instead,
+which never waits for readers or writers, and once the WAL file has grown past
+a threshold and been fully copied back, a ``TRUNCATE`` checkpoint resets it to
+zero bytes.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from . import db
+from .config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpointer:
+    """Checkpoint ``db_path`` every ``interval`` seconds on a daemon thread."""
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        interval: float = 30.0,
+        truncate_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.db_path = db_path
+        self.interval = interval
+        self.truncate_bytes = truncate_bytes
+        self.runs = 0
+        self.truncations = 0
+        self.busy = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def wal_size(self) -> int:
+        path = db.DB_PATH if self.db_path is None else self.db_path
+        try:
+            return os.path.getsize(f"{path}-wal")
+        except OSError:
+            return 0
+
+    def run_once(self) -> Dict[str, int]:
+        """Run one checkpoint; return SQLite's busy/log/checkpointed counts."""
+        with db.get_connection(self.db_path) as conn:
+            busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            # Only truncate once readers have let every frame be copied back,
+            # otherwise TRUNCATE would wait on them
+            if not busy and log == done and self.wal_size() > self.truncate_bytes:
+                busy, log, done = conn.execute(
+                    "PRAGMA wal_checkpoint(TRUNCATE)"
+                ).fetchone()
+                if not busy:
+                    self.truncations += 1
+        self.runs += 1
+        self.busy += busy
+        return {"busy": busy, "log": log, "checkpointed": done}
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as exc:  # keep checkpointing after a failure
+                logger.warning("[!] WAL checkpoint failed: %s", exc)
+
+    def start(self) -> "Checkpointer":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name="wal-checkpoint", daemon=True
+            )
+            self._thread.start()
+            logger.info("[i] WAL checkpoint every %.0f s", self.interval)
+        return self
+
+    def stop(self) -> None:
+        """Stop the thread and run a final checkpoint."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.run_once()
+        logger.info(
+            "[i] WAL checkpoints: %d runs, %d truncations, %d busy",
+            self.runs,
+            self.truncations,
+            self.busy,
+        )
+
+    def __enter__(self) -> "Checkpointer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def from_config(cfg: Config, db_path: Optional[Path] = None) -> Optional[Checkpointer]:
+    """Return a checkpointer for ``cfg``, or ``None`` when disabled."""
+    if cfg.checkpoint_interval_s <= 0:
+        return None
+    return Checkpointer(
+        db_path,
+        interval=cfg.checkpoint_interval_s,
+        truncate_bytes=int(cfg.checkpoint_truncate_mb * 1024 * 1024),
+    )
@@ -3,8 +3,9 @@ from __future__ import annotations
 import click
 
 import logging
+import time
 
-from . import db, fetch as fetch_module, recommend as recommend_module
+from . import db
 from .config import load_config
 
 
@@ -12,8 +13,13 @@ logger = logging.getLogger(__name__)
 
 
 @click.group()
-def cli() -> None:
+@click.pass_context
+def cli(ctx: click.Context) -> None:
     """Curator command line interface."""
+    db.configure(load_config().db_profile)
+    # ``curator db`` manages migrations itself, e.g. to preview them
+    if ctx.invoked_subcommand == "db":
+        return
     db.init_db()
     logger.info("[i] database initialised")
 
@@ -27,18 +33,23 @@ def cli() -> None:
 )
 def fetch(directory: str) -> None:
     """Fetch daily candidates and download them."""
+    from contextlib import nullcontext
+
+    from . import checkpoint
+    from . import fetch as fetch_module
+
     cfg = load_config()
-    ids = fetch_module.fetch_candidates(cfg)
-    logger.info("[i] fetched %d candidates", len(ids))
-    click.echo(f"Fetched {len(ids)} candidates")
-    for item_id in ids:
-        try:
-            path = fetch_module.download_item(item_id, directory, cfg)
-            logger.info("[i] downloaded %s", item_id)
-            click.echo(f"Downloaded {item_id} -> {path}")
-        except Exception as e:  # noqa: BLE001
-            logger.error("[x] %s", e)
-            click.echo(f"Failed {item_id}: {e}", err=True)
+    pipeline = fetch_module.FetchPipeline(directory, cfg)
+    with checkpoint.from_config(cfg) or nullcontext():
+        for item_id, path, error in pipeline.run():
+            if error is None:
+                logger.info("[i] downloaded %s", item_id)
+                click.echo(f"Downloaded {item_id} -> {path}")
+            else:
+                logger.error("[x] %s", error)
+                click.echo(f"Failed {item_id}: {error}", err=True)
+    logger.info("[i] fetched %d candidates", len(pipeline.fetched))
+    click.echo(f"Fetched {len(pipeline.fetched)} candidates")
 
 
 @cli.command(name="list")
@@ -70,18 +81,123 @@ def rate(item_id: str, score: int) -> None:
 @click.option("-n", default=10, help="number of recommendations")
 def recommend(n: int) -> None:
     """Print recommended items."""
-    rows = recommend_module.recommend(n)
+    from . import recommend as recommend_module
+
+    cfg = load_config()
+    cache = recommend_module.RecommendationCache(
+        max(n, cfg.recommend_cache_size),
+        cfg,
+        snapshot=recommend_module.snapshot_path(),
+    )
+    rows = cache.get(n)
     logger.info("[i] recommended %d items", n)
     for row in rows:
         click.echo(f"{row['id']} - {row['title']}")
 
 
+@cli.command()
+@click.option("-b", "batch_size", type=int, default=None, help="embedding batch size")
+@click.option("-w", "workers", type=int, default=None, help="embedding processes")
+def reindex(batch_size: int | None, workers: int | None) -> None:
+    """Re-encode every item, e.g. after changing ``MODEL``."""
+    from . import recommend as recommend_module
+
+    cfg = load_config()
+    if batch_size is not None:
+        cfg.embed_batch_size = batch_size
+    if workers is not None:
+        cfg.embed_workers = workers
+    start = time.perf_counter()
+    count = recommend_module.reindex(cfg)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0.0
+    logger.info("[i] reindexed %d items", count)
+    click.echo(f"Reindexed {count} items ({rate:.1f} items/s)")
+
+
+@cli.command()
+@click.argument("query", nargs=-1, required=True)
+@click.option("-n", default=10, help="results per page")
+@click.option("-p", "page", default=1, help="page number")
+def search(query: tuple[str, ...], n: int, page: int) -> None:
+    """Full-text search titles and descriptions."""
+    text = " ".join(query)
+    rows = db.search_items(text, limit=n, offset=(max(page, 1) - 1) * n)
+    logger.info("[i] search %r returned %d items", text, len(rows))
+    truncated = db.search_truncated(text)
+    if not rows and not truncated:
+        click.echo("No matches")
+    for row in rows:
+        snippet = (
+            row["snippet"]
+            .replace(db.SNIPPET_OPEN, click.style("", bold=True, reset=False))
+            .replace(db.SNIPPET_CLOSE, click.style("", reset=True))
+        )
+        click.echo(f"{row['id']} - {row['title']}")
+        click.echo(f"    {snippet}")
+    if truncated:
+        click.echo(
+            f"Too many matches: showing the best of the {db.SEARCH_CANDIDATES} "
+            "newest. Add words to narrow the search.",
+            err=True,
+        )
+
+
+@cli.command(name="refresh-metadata")
+@click.argument("item_ids", nargs=-1)
+@click.option("-f", "--force", is_flag=True, help="revalidate fresh entries too")
+def refresh_metadata(item_ids: tuple[str, ...], force: bool) -> None:
+    """Revalidate cached IA metadata (all items by default)."""
+    from . import fetch as fetch_module
+    from . import metacache
+
+    cfg = load_config()
+    ids = list(item_ids) or [item_id for _, item_id in db.iter_item_ids()]
+    counts = fetch_module.refresh_metadata(ids, cfg, force=force)
+    cache = metacache.get_cache(cfg)
+    hit_rate = cache.stats()["hit_rate"] if cache else 0.0
+    logger.info("[i] refreshed metadata for %d items", counts["checked"])
+    click.echo(
+        f"Checked {counts['checked']} items: {counts['updated']} updated, "
+        f"{counts['missing']} without a playable file "
+        f"(cache hit rate {100 * hit_rate:.0f}%)"
+    )
+
+
+@cli.group(name="db")
+def db_group() -> None:
+    """Database maintenance."""
+
+
+@db_group.command()
+@click.option("--dry-run", is_flag=True, help="only report pending migrations")
+@click.option(
+    "-b", "batch_size", type=int, default=db.BACKFILL_BATCH, help="backfill batch size"
+)
+def migrate(dry_run: bool, batch_size: int) -> None:
+    """Apply pending schema migrations."""
+    current = db.schema_version()
+    plan = db.migrate(dry_run=dry_run, batch_size=batch_size)
+    if not plan:
+        click.echo(f"Schema is current (version {current})")
+        return
+    verb = "Pending" if dry_run else "Applied"
+    for migration, rows in plan:
+        work = f", ~{rows} rows to backfill" if migration.backfill else ""
+        click.echo(f"{verb} {migration.version}: {migration.description}{work}")
+    if dry_run:
+        click.echo(f"{len(plan)} migrations pending (version {current} -> {db.SCHEMA_VERSION})")
+    else:
+        logger.info("[i] migrated database to version %d", db.SCHEMA_VERSION)
+        click.echo(f"Migrated from version {current} to {db.SCHEMA_VERSION}")
+
+
 @cli.command()
 def web() -> None:
     """Run the Flask web UI."""
     from . import web as web_module
 
-    app = web_module.create_app()
+    app = web_module.create_app(warm=True)
     logger.info("[i] starting web UI on :5000")
     app.run(host="0.0.0.0", port=5000)
 
@@ -12,12 +12,40 @@ class Config:
     """Configuration values for curator."""
 
     daily_candidates: int = 30
+    search_overfetch: float = 3.0  # search rows per wanted candidate
     min_seconds: int = 5
     max_seconds: int = 18_000  # 5 hours
     seed_keywords: List[str] = field(default_factory=list)
     download_cap_gb: int = 50
+    playable_formats: List[str] = field(
+        default_factory=lambda: ["h.264", "h264", "mpeg4", "quicktime"]
+    )  # IA format substrings; the largest matching file is downloaded
+    download_workers: int = 2  # concurrent file transfers
+    download_bandwidth_mbps: float = 0.0  # aggregate ceiling, 0 = unlimited
+    download_chunk_kb: int = 1024  # read/write block size for transfers
+    pipeline_queue_size: int = 8  # resolved candidates waiting for a download
     rps_limit: float = 1.0
+    rps_burst: float = 1.0  # requests allowed back to back per host
     timeout: float = 10.0
+    fetch_workers: int = 4  # concurrent /metadata lookups
+    http_pool_size: int = 0  # keep-alive connections per host, 0 = workers + 1
+    http_retries: int = 3  # transport retries on connect errors and 5xx
+    metadata_ttl_hours: float = 24.0  # serve cached /metadata without revalidating
+    metadata_cache_mb: float = 256.0  # on-disk metadata cache size, 0 disables
+    embedding_backend: str = "sentence-transformers"  # or "hashing"
+    embedding_model: str = ""  # sentence-transformers model, "" = default
+    embedding_dim: int = 384  # hashing backend only
+    embedding_dtype: str = "float32"  # or "float16" to halve storage
+    embed_batch_size: int = 64
+    embed_workers: int = 1  # >1 encodes batches in a process pool
+    ann_threshold: int = 100_000  # use the IVF index at or above this size
+    ann_nprobe: int = 8  # clusters probed per query: higher = better recall
+    ann_nlist: int = 0  # clusters in the index, 0 = sqrt(items)
+    preference_half_life_days: float = 0.0  # 0 disables rating time decay
+    recommend_cache_size: int = 100  # ranked items kept by the cache
+    db_profile: str = "performance"  # SQLite pragmas, or "safe" (fsync every commit)
+    checkpoint_interval_s: float = 30.0  # background WAL checkpoints, 0 disables
+    checkpoint_truncate_mb: float = 64.0  # reset the WAL file past this size
 
 
 DEFAULT_CONFIG = Config(
@@ -1,59 +1,783 @@
 from __future__ import annotations
 
+import atexit
+import json
+import re
 import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from array import array
 from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Iterable, Optional, List
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional
+import logging
 import os
 
 
+logger = logging.getLogger(__name__)
+
+
 DB_PATH = Path(os.getenv("CURATOR_DB_PATH", "curator.db"))
 
+# Hot queries, kept here so tests can check each one is answered from an
+# index (``EXPLAIN QUERY PLAN``). Time windows are half-open ranges over the
+# stored UTC timestamps so the indexes on those columns apply.
+ITEMS_ADDED_BETWEEN = """
+    SELECT i.*, s.count AS rating_count, s.mean AS rating_mean
+    FROM items i LEFT JOIN rating_stats s ON s.item_id = i.id
+    WHERE i.added_at >= :start AND i.added_at < :end
+    ORDER BY i.added_at DESC
+    LIMIT :limit
+"""
+DOWNLOADED_BYTES_BETWEEN = """
+    SELECT COALESCE(SUM(size_bytes), 0) FROM downloads
+    WHERE downloaded_at >= :start AND downloaded_at < :end
+"""
+LATEST_DOWNLOAD_STATUS = """
+    SELECT status FROM downloads WHERE item_id = :item_id
+    ORDER BY rowid DESC LIMIT 1
+"""
+# Markers around search hits in snippets; control characters cannot occur in
+# the tokenized text, so callers can escape it and then swap in markup
+SNIPPET_OPEN = "\x02"
+SNIPPET_CLOSE = "\x03"
+# BM25 weight of a title hit relative to a description hit
+SEARCH_TITLE_WEIGHT = 10.0
 
-@contextmanager
-def get_connection(db_path: Optional[Path] = None) -> Iterable[sqlite3.Connection]:
-    """Yield a SQLite connection with WAL mode enabled."""
-    if db_path is None:
-        db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+RATINGS_FOR_ITEM = """
+    SELECT rating, rated_at FROM ratings WHERE item_id = :item_id
+    ORDER BY rated_at
+"""
+RATING_STATS_FOR_ITEM = """
+    SELECT count, total, mean, last_rated_at FROM rating_stats WHERE item_id = :item_id
+"""
+RATING_EVENTS_FOR_ITEM = """
+    SELECT rating, julianday(rated_at) FROM ratings WHERE item_id = :item_id
+    ORDER BY rowid
+"""
+# BM25 is scored over at most this many of the newest matches, so a word
+# found in most of the catalog still ranks in milliseconds
+SEARCH_CANDIDATES = 2000
+# Words shown around the first hit in a search snippet
+SNIPPET_WORDS = 16
+SEARCH_ITEMS = """
+    SELECT i.id, i.title, i.description, i.url FROM (
+        SELECT rowid, rank FROM items_fts WHERE items_fts MATCH :query
+        ORDER BY rowid DESC LIMIT :candidates
+    ) AS hits JOIN items i ON i.rowid = hits.rowid
+    ORDER BY hits.rank
+    LIMIT :limit OFFSET :offset
+"""
+# Counting stops after ``:limit`` matches, enough to tell if ranking was cut
+SEARCH_MATCHES = """
+    SELECT count(*) FROM (
+        SELECT rowid FROM items_fts WHERE items_fts MATCH :query LIMIT :limit
+    )
+"""
+HOT_QUERIES = (
+    ITEMS_ADDED_BETWEEN,
+    DOWNLOADED_BYTES_BETWEEN,
+    LATEST_DOWNLOAD_STATUS,
+    RATINGS_FOR_ITEM,
+    RATING_STATS_FOR_ITEM,
+    RATING_EVENTS_FOR_ITEM,
+    SEARCH_ITEMS,
+    SEARCH_MATCHES,
+)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def utc_day_bounds(day: Optional[date] = None) -> tuple[str, str]:
+    """Return ``[start, end)`` timestamps covering ``day`` (default today, UTC)."""
+    if day is None:
+        day = datetime.now(timezone.utc).date()
+    start = datetime.combine(day, datetime.min.time())
+    return (
+        start.strftime(TIMESTAMP_FORMAT),
+        (start + timedelta(days=1)).strftime(TIMESTAMP_FORMAT),
+    )
+
+
+# Statements compiled and kept per connection
+CACHED_STATEMENTS = 256
+# Idle connections kept per database file
+POOL_SIZE = 8
+
+# Per-connection pragmas, selected with ``Config.db_profile``
+PROFILES: Dict[str, Dict[str, object]] = {
+    # SQLite's defaults: every commit is fsynced
+    "safe": {
+        "synchronous": "FULL",
+        "cache_size": -2000,  # KiB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,  # ms
+        "wal_autocheckpoint": 1000,  # pages
+    },
+    # With WAL, NORMAL only fsyncs at checkpoints: the database stays
+    # consistent after a crash, a power loss may drop the latest commits
+    "performance": {
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        # Backstop only; ``curator.checkpoint`` normally keeps the WAL short
+        "wal_autocheckpoint": 10000,
+    },
+}
+DEFAULT_PROFILE = "performance"
+
+
+class _Connection(sqlite3.Connection):
+    """Connection that remembers which pragma profile it was opened with."""
+
+    profile = ""
+
+
+_POOL: Dict[str, List[sqlite3.Connection]] = {}
+_POOL_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_profile = DEFAULT_PROFILE
+
+
+def configure(profile: str) -> None:
+    """Select the pragma profile used by connections opened from now on.
+
+    Idle pooled connections opened with another profile are closed; ones in
+    use are closed when they are returned.
+    """
+    global _profile
+    if profile not in PROFILES:
+        raise ValueError(
+            f"unknown db_profile {profile!r}, expected one of {sorted(PROFILES)}"
+        )
+    if profile == _profile:
+        return
+    _profile = profile
+    close_connections()
+    logger.info("[i] SQLite profile %s", profile)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Open a connection and run the one-time pragmas."""
+    # Pooled connections move between threads, but only one uses each at a time
+    conn = sqlite3.connect(
+        path,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,
+        factory=_Connection,
+    )
     conn.row_factory = sqlite3.Row
     mode = conn.execute("PRAGMA journal_mode=WAL;").fetchone()[0]
     if str(mode).lower() != "wal":
+        conn.close()
         raise RuntimeError("WAL mode could not be enabled")
+    conn.profile = _profile
+    for name, value in PROFILES[_profile].items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def _checkout(path: str) -> sqlite3.Connection:
+    with _POOL_LOCK:
+        idle = _POOL.get(path)
+        if idle:
+            return idle.pop()
+    return _connect(path)
+
+
+def _checkin(path: str, conn: sqlite3.Connection) -> None:
+    if conn.profile != _profile:
+        conn.close()
+        return
+    with _POOL_LOCK:
+        idle = _POOL.setdefault(path, [])
+        if len(idle) < POOL_SIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+@contextmanager
+def get_connection(db_path: Optional[Path] = None) -> Iterator[sqlite3.Connection]:
+    """Yield this thread's connection to ``db_path`` with WAL mode enabled.
+
+    Connections come from a small per-file pool and stay bound to the thread
+    while in use, so nested calls share one connection and one transaction.
+    The outermost block commits, or rolls back if it raises.
+    """
+    path = str(db_path if db_path is not None else DB_PATH)
+    active = _LOCAL.__dict__.setdefault("active", {})
+    entry = active.get(path)
+    if entry is not None:
+        entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            entry[1] -= 1
+        return
+    conn = _checkout(path)
+    entry = active[path] = [conn, 1]
     try:
         yield conn
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
+        del active[path]
+        _checkin(path, conn)
+
+
+@contextmanager
+def transaction(db_path: Optional[Path] = None) -> Iterator[sqlite3.Connection]:
+    """Run a multi-statement write atomically.
+
+    Takes the write lock up front (``BEGIN IMMEDIATE``), since a read
+    snapshot cannot be upgraded once another connection has committed. Inside
+    an open transaction this simply joins it.
+    """
+    with get_connection(db_path) as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+
+def close_connections() -> None:
+    """Close every idle pooled connection."""
+    with _POOL_LOCK:
+        conns = [conn for idle in _POOL.values() for conn in idle]
+        _POOL.clear()
+    for conn in conns:
         conn.close()
 
 
+atexit.register(close_connections)
+
+
+def _base_schema(conn: sqlite3.Connection) -> None:
+    """Tables, triggers and indexes up to version 5.
+
+    Idempotent, so it also upgrades databases created before versioned
+    migrations (``user_version`` 0-4).
+    """
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS items (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            description TEXT,
+            duration INTEGER,
+            url TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            size_bytes INTEGER
+        );
+        
+        CREATE TABLE IF NOT EXISTS ratings (
+            item_id TEXT REFERENCES items(id),
+            rating INTEGER,
+            rated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE TABLE IF NOT EXISTS downloads (
+            item_id TEXT REFERENCES items(id),
+            size_bytes INTEGER,
+            downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'complete'
+        );
+
+        -- Every file IA lists for an item; the PK also serves per-item lookups
+        CREATE TABLE IF NOT EXISTS item_files (
+            item_id TEXT REFERENCES items(id),
+            name TEXT,
+            format TEXT,
+            size_bytes INTEGER,
+            md5 TEXT,
+            sha1 TEXT,
+            duration REAL,
+            PRIMARY KEY (item_id, name)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS embeddings (
+            item_id TEXT PRIMARY KEY REFERENCES items(id),
+            model TEXT,
+            content_hash TEXT,
+            vector BLOB
+        );
+
+        CREATE TABLE IF NOT EXISTS preferences (
+            model TEXT PRIMARY KEY,
+            vector BLOB,
+            weight REAL,
+            half_life_days REAL,
+            reference_day REAL
+        );
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        );
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0);
+        """
+    )
+    _ensure_column(conn, "downloads", "status", "TEXT DEFAULT 'complete'")
+    _ensure_column(conn, "items", "size_bytes", "INTEGER")
+    conn.executescript(
+        """
+        CREATE INDEX IF NOT EXISTS idx_items_added_at ON items (added_at);
+        CREATE INDEX IF NOT EXISTS idx_ratings_item
+            ON ratings (item_id, rated_at);
+        -- size_bytes makes the daily cap sum index-only
+        CREATE INDEX IF NOT EXISTS idx_downloads_downloaded_at
+            ON downloads (downloaded_at, size_bytes);
+        CREATE INDEX IF NOT EXISTS idx_downloads_item ON downloads (item_id);
+        """
+    )
+    # Bump data_version on any change to items or ratings
+    for table in ("items", "ratings"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version
+                AFTER {event} ON {table} BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+                END
+                """
+            )
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """Data filled in after a migration's schema step, in bounded batches.
+
+    ``estimate`` counts the rows to touch and must run on the schema from
+    before the migration (dry runs use it). ``step`` updates at most
+    ``:batch`` rows and must skip rows already done, so an interrupted
+    backfill resumes where it stopped.
+
+    With ``rowid_table`` the step instead covers ``rowid > :lo AND rowid <=
+    :hi`` and is run over consecutive windows of that table up to its last
+    rowid when the backfill starts; rows added later are left to triggers.
+    Such steps must be idempotent, since an interrupted run starts over.
+    """
+
+    estimate: str
+    step: str
+    rowid_table: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    # Must be idempotent: it runs again if the backfill was interrupted
+    schema: Callable[[sqlite3.Connection], None]
+    backfill: Optional[Backfill] = None
+
+
+def _rating_stats_schema(conn: sqlite3.Connection) -> None:
+    """Per-item rating aggregates kept current by triggers on ``ratings``.
+
+    Inserts update an existing row in O(1); an item without one (not yet
+    backfilled) is aggregated from its log instead. Updates and deletes
+    recompute the affected items.
+    """
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS rating_stats (
+            item_id TEXT PRIMARY KEY REFERENCES items(id),
+            count INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            last_rated_at TIMESTAMP
+        );
+
+        CREATE TRIGGER IF NOT EXISTS ratings_insert_stats
+        AFTER INSERT ON ratings BEGIN
+            UPDATE rating_stats SET
+                count = count + 1,
+                total = total + NEW.rating,
+                mean = CAST(total + NEW.rating AS REAL) / (count + 1),
+                last_rated_at = max(last_rated_at, NEW.rated_at)
+            WHERE item_id = NEW.item_id;
+            INSERT INTO rating_stats
+            SELECT item_id, COUNT(*), SUM(rating), AVG(rating), MAX(rated_at)
+            FROM ratings
+            WHERE item_id = NEW.item_id
+              AND NOT EXISTS (SELECT 1 FROM rating_stats WHERE item_id = NEW.item_id)
+            GROUP BY item_id;
+        END;
+        """
+    )
+    for event, items in (("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+        recompute = "".join(
+            f"""
+            DELETE FROM rating_stats WHERE item_id = {ref}.item_id;
+            INSERT INTO rating_stats
+            SELECT item_id, COUNT(*), SUM(rating), AVG(rating), MAX(rated_at)
+            FROM ratings WHERE item_id = {ref}.item_id GROUP BY item_id;
+            """
+            for ref in items
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS ratings_{event.lower()}_stats
+            AFTER {event} ON ratings BEGIN {recompute} END
+            """
+        )
+
+
+def _items_fts_schema(conn: sqlite3.Connection) -> None:
+    """BM25-searchable copy of item titles and descriptions.
+
+    The FTS5 table keeps its own copy of the text (rather than reading
+    ``items`` as external content), so triggers and the rowid-windowed
+    backfill can safely overwrite or delete rows in any order.
+    """
+    conn.executescript(
+        f"""
+        -- Prefix indexes keep short type-ahead prefixes from expanding to
+        -- thousands of terms
+        CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+            title, description,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+        -- ORDER BY rank weighs title matches over description matches
+        INSERT INTO items_fts (items_fts, rank)
+        VALUES ('rank', 'bm25({SEARCH_TITLE_WEIGHT}, 1.0)');
+
+        -- Delete-then-insert rather than OR REPLACE, which the outer
+        -- statement's conflict policy (e.g. an upsert) would override
+        CREATE TRIGGER IF NOT EXISTS items_insert_fts AFTER INSERT ON items BEGIN
+            DELETE FROM items_fts WHERE rowid = NEW.rowid;
+            INSERT INTO items_fts (rowid, title, description)
+            VALUES (NEW.rowid, NEW.title, NEW.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS items_update_fts
+        AFTER UPDATE OF title, description ON items BEGIN
+            DELETE FROM items_fts WHERE rowid = OLD.rowid;
+            INSERT INTO items_fts (rowid, title, description)
+            VALUES (NEW.rowid, NEW.title, NEW.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS items_delete_fts AFTER DELETE ON items BEGIN
+            DELETE FROM items_fts WHERE rowid = OLD.rowid;
+        END;
+        """
+    )
+
+
+def _drop_embedding_hash(conn: sqlite3.Connection) -> None:
+    """Drop ``embeddings.content_hash``, which was written but never read.
+
+    Vectors of edited items are dropped by ``insert_items`` instead.
+    ``DROP COLUMN`` needs SQLite 3.35; older versions keep the unused column.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+    if "content_hash" in columns and sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute("ALTER TABLE embeddings DROP COLUMN content_hash")
+
+
+def _embedding_queue_schema(conn: sqlite3.Connection) -> None:
+    """Items awaiting a vector and vectors stored per model, kept by triggers.
+
+    New items and items whose vector is deleted (changed text, a backend
+    switch) are queued in ``embedding_pending`` until a vector is stored,
+    so finding work and counting vectors never scans the catalog.
+    ``store_embeddings`` upserts rather than ``OR REPLACE``, whose implicit
+    delete would not fire the delete trigger.
+    """
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_pending (
+            item_id TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS embedding_counts (
+            model TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS items_insert_pending AFTER INSERT ON items
+        WHEN NOT EXISTS (SELECT 1 FROM embeddings WHERE item_id = NEW.id) BEGIN
+            INSERT OR IGNORE INTO embedding_pending VALUES (NEW.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS items_delete_pending AFTER DELETE ON items BEGIN
+            DELETE FROM embedding_pending WHERE item_id = OLD.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS embeddings_insert_pending
+        AFTER INSERT ON embeddings BEGIN
+            DELETE FROM embedding_pending WHERE item_id = NEW.item_id;
+            INSERT INTO embedding_counts VALUES (NEW.model, 1)
+            ON CONFLICT(model) DO UPDATE SET count = count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS embeddings_update_pending
+        AFTER UPDATE OF model ON embeddings
+        WHEN OLD.model IS NOT NEW.model BEGIN
+            UPDATE embedding_counts SET count = count - 1 WHERE model = OLD.model;
+            INSERT INTO embedding_counts VALUES (NEW.model, 1)
+            ON CONFLICT(model) DO UPDATE SET count = count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS embeddings_delete_pending
+        AFTER DELETE ON embeddings BEGIN
+            UPDATE embedding_counts SET count = count - 1 WHERE model = OLD.model;
+            INSERT OR IGNORE INTO embedding_pending
+            SELECT id FROM items WHERE id = OLD.item_id;
+        END;
+
+        -- After the triggers, so writes made meanwhile are not lost
+        DELETE FROM embedding_counts;
+        INSERT INTO embedding_counts
+        SELECT model, COUNT(*) FROM embeddings WHERE model IS NOT NULL GROUP BY model;
+        """
+    )
+
+
+def _embedding_version_schema(conn: sqlite3.Connection) -> None:
+    """Count changes to the vectors ``recommend`` ranks, for its matrix cache.
+
+    ``data_version`` also moves on every rating, which leaves the vectors
+    alone; deleting an item bumps this counter as well since cached rows are
+    keyed by ``items.rowid``.
+    """
+    conn.execute(
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('embedding_version', 0)"
+    )
+    for table, event in (
+        ("embeddings", "INSERT"),
+        ("embeddings", "UPDATE"),
+        ("embeddings", "DELETE"),
+        ("items", "DELETE"),
+    ):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_embedding_version
+            AFTER {event} ON {table} BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'embedding_version';
+            END
+            """
+        )
+
+
+# Applied in order; ``PRAGMA user_version`` records the last one completed
+MIGRATIONS: List[Migration] = [
+    Migration(5, "base schema, file listings and lookup indexes", _base_schema),
+    Migration(
+        6,
+        "rating_stats aggregates",
+        _rating_stats_schema,
+        Backfill(
+            estimate="SELECT COUNT(DISTINCT item_id) FROM ratings",
+            step="""
+                INSERT INTO rating_stats
+                SELECT item_id, COUNT(*), SUM(rating), AVG(rating), MAX(rated_at)
+                FROM ratings
+                WHERE item_id IN (
+                    SELECT DISTINCT r.item_id FROM ratings r
+                    WHERE r.item_id IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM rating_stats s WHERE s.item_id = r.item_id
+                    )
+                    LIMIT :batch
+                )
+                GROUP BY item_id
+            """,
+        ),
+    ),
+    Migration(
+        7,
+        "full-text search index over items",
+        _items_fts_schema,
+        Backfill(
+            estimate="SELECT COUNT(*) FROM items",
+            step="""
+                INSERT OR REPLACE INTO items_fts (rowid, title, description)
+                SELECT rowid, title, description FROM items
+                WHERE rowid > :lo AND rowid <= :hi
+            """,
+            rowid_table="items",
+        ),
+    ),
+    Migration(8, "drop unused embeddings.content_hash", _drop_embedding_hash),
+    Migration(
+        9,
+        "queue of items awaiting embeddings",
+        _embedding_queue_schema,
+        Backfill(
+            estimate="SELECT COUNT(*) FROM items",
+            step="""
+                INSERT OR IGNORE INTO embedding_pending
+                SELECT id FROM items
+                WHERE rowid > :lo AND rowid <= :hi
+                  AND NOT EXISTS (SELECT 1 FROM embeddings e WHERE e.item_id = items.id)
+            """,
+            rowid_table="items",
+        ),
+    ),
+    Migration(10, "version counter for stored vectors", _embedding_version_schema),
+]
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+# Rows per backfill transaction, and the pause between them so web
+# requests can take the write lock
+BACKFILL_BATCH = 5000
+BACKFILL_PAUSE = 0.01
+
+
+def schema_version(db_path: Optional[Path] = None) -> int:
+    """Return the last migration applied (``PRAGMA user_version``)."""
+    with get_connection(db_path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(db_path: Optional[Path] = None) -> List[tuple[Migration, int]]:
+    """Return migrations not yet applied with the rows each would backfill."""
+    current = schema_version(db_path)
+    plan = []
+    with get_connection(db_path) as conn:
+        for migration in MIGRATIONS:
+            if migration.version <= current:
+                continue
+            rows = 0
+            if migration.backfill is not None:
+                try:
+                    rows = conn.execute(migration.backfill.estimate).fetchone()[0]
+                except sqlite3.OperationalError:
+                    # Source table not created yet, so there is nothing to fill
+                    rows = 0
+            plan.append((migration, rows))
+    return plan
+
+
+def migrate(
+    db_path: Optional[Path] = None,
+    dry_run: bool = False,
+    batch_size: int = BACKFILL_BATCH,
+) -> List[tuple[Migration, int]]:
+    """Apply pending migrations in order and return what was (or would be) run.
+
+    Each schema step commits on its own; backfills then run in transactions
+    of ``batch_size`` rows so readers and other writers in WAL mode are only
+    held up briefly. ``user_version`` is bumped once a migration's backfill
+    has finished.
+    """
+    plan = pending_migrations(db_path)
+    if dry_run:
+        return plan
+    for migration, _ in plan:
+        with get_connection(db_path) as conn:
+            migration.schema(conn)
+        if migration.backfill is not None:
+            filled = _backfill(migration.backfill, db_path, batch_size)
+            logger.info("[i] backfilled %d rows for version %d", filled, migration.version)
+        with get_connection(db_path) as conn:
+            conn.execute(f"PRAGMA user_version = {migration.version}")
+        logger.info("[i] migrated database to version %d", migration.version)
+    return plan
+
+
+def _backfill(backfill: Backfill, db_path: Optional[Path], batch_size: int) -> int:
+    total = 0
+    if backfill.rowid_table is not None:
+        with get_connection(db_path) as conn:
+            last = conn.execute(
+                f"SELECT COALESCE(MAX(rowid), 0) FROM {backfill.rowid_table}"
+            ).fetchone()[0]
+        for lo in range(0, last, batch_size):
+            with transaction(db_path) as conn:
+                params = {"lo": lo, "hi": lo + batch_size}
+                total += max(conn.execute(backfill.step, params).rowcount, 0)
+            time.sleep(BACKFILL_PAUSE)
+        return total
+    while True:
+        with transaction(db_path) as conn:
+            count = conn.execute(backfill.step, {"batch": batch_size}).rowcount
+        total += max(count, 0)
+        if count < batch_size:
+            return total
+        time.sleep(BACKFILL_PAUSE)
+
+
 def init_db(db_path: Optional[Path] = None) -> None:
-    """Initialise the database schema."""
-    with get_connection(db_path) as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS items (
-                id TEXT PRIMARY KEY,
-                title TEXT,
-                description TEXT,
-                duration INTEGER,
-                url TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            
-            CREATE TABLE IF NOT EXISTS ratings (
-                item_id TEXT REFERENCES items(id),
-                rating INTEGER,
-                rated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            
-            CREATE TABLE IF NOT EXISTS downloads (
-                item_id TEXT REFERENCES items(id),
-                size_bytes INTEGER,
-                downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
+    """Create or upgrade the schema; a no-op once it is current."""
+    migrate(db_path)
+
+
+def _ensure_column(
+    conn: sqlite3.Connection, table: str, column: str, decl: str
+) -> None:
+    """Add ``column`` to ``table`` if a database predates it."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+ITEM_COLUMNS = ("id", "title", "description", "duration", "url", "added_at", "size_bytes")
+
+
+def _item_row(row) -> tuple:
+    if isinstance(row, Mapping):
+        return tuple(row.get(col) for col in ITEM_COLUMNS)
+    row = tuple(row)
+    return row + (None,) * (len(ITEM_COLUMNS) - len(row))
+
+
+def insert_items(rows: Iterable, db_path: Optional[Path] = None) -> int:
+    """Upsert many items in one transaction and return how many were given.
+
+    ``rows`` are mappings keyed by ``ITEM_COLUMNS`` or tuples in that order
+    (trailing ``added_at``/``size_bytes`` may be omitted). Existing items
+    keep their ``added_at`` and rowid, so ratings and downloads stay
+    attached; stored embeddings are dropped where the title or description
+    changes.
+    """
+    params = [_item_row(row) for row in rows]
+    if not params:
+        return 0
+    with transaction(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS incoming_items (
+                id TEXT, title TEXT, description TEXT, duration INTEGER,
+                url TEXT, added_at TIMESTAMP, size_bytes INTEGER
+            )
+            """
+        )
+        conn.execute("DELETE FROM incoming_items")
+        conn.executemany(
+            "INSERT INTO incoming_items VALUES (?, ?, ?, ?, ?, ?, ?)", params
+        )
+        changed = conn.execute(
+            """
+            SELECT DISTINCT e.item_id FROM incoming_items n
+            JOIN items i ON i.id = n.id
+            JOIN embeddings e ON e.item_id = i.id
+            WHERE i.title IS NOT n.title OR i.description IS NOT n.description
+            """
+        ).fetchall()
+        for (item_id,) in changed:
+            _retarget_preferences(conn, item_id, None, None)
+            conn.execute("DELETE FROM embeddings WHERE item_id = ?", (item_id,))
+        conn.execute(
+            """
+            INSERT INTO items
+                (id, title, description, duration, url, added_at, size_bytes)
+            SELECT id, title, description, duration, url,
+                   COALESCE(added_at, CURRENT_TIMESTAMP), size_bytes
+            FROM incoming_items WHERE true
+            ON CONFLICT (id) DO UPDATE SET
+                title = excluded.title,
+                description = excluded.description,
+                duration = excluded.duration,
+                url = excluded.url,
+                size_bytes = COALESCE(excluded.size_bytes, items.size_bytes)
             """
         )
+        conn.execute("DELETE FROM incoming_items")
+    return len(params)
 
 
 def insert_item(
@@ -63,55 +787,317 @@ def insert_item(
     duration: int,
     url: str,
     added_at: Optional[str] = None,
+    size_bytes: Optional[int] = None,
     db_path: Optional[Path] = None,
 ) -> None:
-    """Insert a new item into the ``items`` table."""
+    """Insert or update one item; see :func:`insert_items`.
+
+    ``size_bytes`` is the expected file size from IA metadata, if known.
+    """
+    insert_items(
+        [(item_id, title, description, duration, url, added_at, size_bytes)],
+        db_path=db_path,
+    )
+
+
+def store_item_files(
+    item_id: str, files: List[dict], db_path: Optional[Path] = None
+) -> None:
+    """Replace the stored file listing of ``item_id``; see :func:`replace_item_files`."""
+    replace_item_files({item_id: files}, db_path=db_path)
+
+
+def replace_item_files(
+    listings: Mapping[str, List[dict]], db_path: Optional[Path] = None
+) -> None:
+    """Replace the file listings of several items in one transaction.
+
+    Each file is a dict with ``name``, ``format``, ``size_bytes``, ``md5``,
+    ``sha1`` and ``duration`` keys.
+    """
+    if not listings:
+        return
     with get_connection(db_path) as conn:
-        conn.execute(
+        conn.executemany(
+            "DELETE FROM item_files WHERE item_id = ?", [(i,) for i in listings]
+        )
+        conn.executemany(
             """
-            INSERT OR REPLACE INTO items (id, title, description, duration, url, added_at)
-            VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            INSERT OR REPLACE INTO item_files
+                (item_id, name, format, size_bytes, md5, sha1, duration)
+            VALUES (:item_id, :name, :format, :size_bytes, :md5, :sha1, :duration)
             """,
-            (item_id, title, description, duration, url, added_at),
+            [
+                {**f, "item_id": item_id}
+                for item_id, files in listings.items()
+                for f in files
+            ],
         )
 
 
+def best_item_files(
+    item_ids: Iterable[str], formats: Iterable[str], db_path: Optional[Path] = None
+) -> Dict[str, sqlite3.Row]:
+    """Return the largest file matching any of ``formats`` for each item."""
+    ids = list(item_ids)
+    patterns = [f"%{fmt.lower()}%" for fmt in formats]
+    if not ids or not patterns:
+        return {}
+    match = " OR ".join("lower(format) LIKE ?" for _ in patterns)
+    with get_connection(db_path) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT item_id, name, format, size_bytes, md5, sha1 FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY item_id ORDER BY size_bytes DESC
+                ) AS rank
+                FROM item_files
+                WHERE item_id IN (SELECT value FROM json_each(?)) AND ({match})
+            ) WHERE rank = 1
+            """,
+            (json.dumps(ids), *patterns),
+        ).fetchall()
+    return {row["item_id"]: row for row in rows}
+
+
+def best_item_file(
+    item_id: str, formats: Iterable[str], db_path: Optional[Path] = None
+) -> Optional[sqlite3.Row]:
+    """Return the largest stored file whose format matches any of ``formats``."""
+    return best_item_files([item_id], formats, db_path=db_path).get(item_id)
+
+
+def get_item_file(
+    item_id: str, name: str, db_path: Optional[Path] = None
+) -> Optional[sqlite3.Row]:
+    """Return the stored listing entry for one file of ``item_id``."""
+    with get_connection(db_path) as conn:
+        return conn.execute(
+            "SELECT * FROM item_files WHERE item_id = ? AND name = ?",
+            (item_id, name),
+        ).fetchone()
+
+
+def update_item_file(
+    item_id: str, url: str, size_bytes: Optional[int], db_path: Optional[Path] = None
+) -> bool:
+    """Point ``item_id`` at a new download URL; return ``True`` if it changed."""
+    with get_connection(db_path) as conn:
+        cur = conn.execute(
+            """
+            UPDATE items SET url = ?, size_bytes = ?
+            WHERE id = ? AND (url IS NOT ? OR size_bytes IS NOT ?)
+            """,
+            (url, size_bytes, item_id, url, size_bytes),
+        )
+        return cur.rowcount > 0
+
+
 def record_rating(
     item_id: str,
     rating: int,
     rated_at: Optional[str] = None,
     db_path: Optional[Path] = None,
 ) -> None:
-    """Record a rating for an item."""
+    """Record a rating for an item.
+
+    Stored preference vectors are updated in place in ``O(dim)``. The stats
+    are read under the write lock, so concurrent ratings of one item each
+    shift the preference from the mean the previous one left.
+    """
     if not 1 <= rating <= 10:
         raise ValueError("rating must be between 1 and 10")
-    with get_connection(db_path) as conn:
-        conn.execute(
+    with transaction(db_path) as conn:
+        stats = conn.execute(RATING_STATS_FOR_ITEM, {"item_id": item_id}).fetchone()
+        count, total = (stats["count"], stats["total"]) if stats else (0, 0)
+        cur = conn.execute(
             """
             INSERT INTO ratings (item_id, rating, rated_at)
             VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))
             """,
             (item_id, rating, rated_at),
         )
+        day = conn.execute(
+            "SELECT julianday(rated_at) FROM ratings WHERE rowid = ?",
+            (cur.lastrowid,),
+        ).fetchone()[0]
+        old_mean = total / count if count else 0.0
+        new_mean = (total + rating) / (count + 1)
+        rows = conn.execute(
+            """
+            SELECT p.*, e.vector AS item_vector FROM preferences p
+            JOIN embeddings e ON e.item_id = ? AND e.model = p.model
+            """,
+            (item_id,),
+        ).fetchall()
+        for pref in rows:
+            _shift_preference(
+                conn,
+                pref,
+                _unpack_vector(pref["item_vector"], len(pref["vector"]) // 4),
+                [(new_mean - old_mean, day)],
+            )
+
+
+def _unpack_vector(blob: bytes, dim: int) -> array:
+    """Decode a stored float32 or float16 item vector of ``dim`` values.
+
+    Preference sums are always float32, so an item blob of half their size
+    holds float16 values.
+    """
+    if len(blob) == 2 * dim:
+        return array("f", struct.unpack(f"<{dim}e", blob))
+    return array("f", blob)
+
+
+def _item_events(conn: sqlite3.Connection, item_id: str) -> List[tuple[float, float]]:
+    """Return ``(mean delta, julian day)`` for each rating of ``item_id``.
+
+    An item's weight is its mean rating, so each rating contributes the
+    change it made to that mean; the deltas sum to the current mean.
+    """
+    events = []
+    count, total = 0, 0.0
+    for rating, day in conn.execute(RATING_EVENTS_FOR_ITEM, {"item_id": item_id}):
+        old_mean = total / count if count else 0.0
+        count += 1
+        total += rating
+        events.append((total / count - old_mean, day))
+    return events
+
+
+def _shift_preference(
+    conn: sqlite3.Connection,
+    pref: sqlite3.Row,
+    item_vector: array,
+    events: List[tuple[float, float]],
+    sign: float = 1.0,
+) -> None:
+    """Add (``sign=-1``: remove) ``events`` times ``item_vector`` to ``pref``.
+
+    The sum is kept relative to ``reference_day``. With a half-life, moving
+    the reference forward decays the stored sum and older events are added
+    pre-decayed, so no rating is ever revisited. Runs in ``O(dim)``.
+    """
+    if not events:
+        return
+    vector = array("f", pref["vector"])
+    weight = pref["weight"]
+    reference = pref["reference_day"]
+    half_life = pref["half_life_days"] or 0.0
+    latest = max(day for _, day in events)
+    if reference is None:
+        reference = latest
+    elif latest > reference:
+        if half_life > 0:
+            decay = 0.5 ** ((latest - reference) / half_life)
+            vector = array("f", (v * decay for v in vector))
+            weight *= decay
+        reference = latest
+    step = 0.0
+    for delta, day in events:
+        step += delta * (0.5 ** ((reference - day) / half_life) if half_life > 0 else 1.0)
+    step *= sign
+    vector = array("f", (v + step * x for v, x in zip(vector, item_vector)))
+    conn.execute(
+        """
+        UPDATE preferences SET vector = ?, weight = ?, reference_day = ?
+        WHERE model = ?
+        """,
+        (vector.tobytes(), weight + step, reference, pref["model"]),
+    )
+
+
+def _retarget_preferences(
+    conn: sqlite3.Connection,
+    item_id: str,
+    model: Optional[str],
+    vector: Optional[bytes],
+) -> None:
+    """Move a rated item's contribution from its stored vector to ``vector``.
+
+    Called before an item's embedding is replaced (or dropped, when
+    ``model`` is ``None``) so stored preferences stay exact.
+    """
+    events = _item_events(conn, item_id)
+    if not events:
+        return
+    old = conn.execute(
+        "SELECT model, vector FROM embeddings WHERE item_id = ?", (item_id,)
+    ).fetchone()
+    if old is not None:
+        pref = conn.execute(
+            "SELECT * FROM preferences WHERE model = ?", (old["model"],)
+        ).fetchone()
+        if pref is not None:
+            dim = len(pref["vector"]) // 4
+            _shift_preference(conn, pref, _unpack_vector(old["vector"], dim), events, -1.0)
+    if model is not None and vector is not None:
+        pref = conn.execute(
+            "SELECT * FROM preferences WHERE model = ?", (model,)
+        ).fetchone()
+        if pref is not None:
+            dim = len(pref["vector"]) // 4
+            _shift_preference(conn, pref, _unpack_vector(vector, dim), events)
+
+
+def get_preference(model: str, db_path: Optional[Path] = None) -> Optional[sqlite3.Row]:
+    """Return the stored preference row for ``model`` if any."""
+    with get_connection(db_path) as conn:
+        return conn.execute(
+            "SELECT * FROM preferences WHERE model = ?", (model,)
+        ).fetchone()
+
+
+def store_preference(
+    model: str,
+    vector: bytes,
+    weight: float,
+    half_life_days: float,
+    reference_day: Optional[float],
+    db_path: Optional[Path] = None,
+) -> None:
+    """Replace the preference sum for ``model``."""
+    with get_connection(db_path) as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO preferences
+                (model, vector, weight, half_life_days, reference_day)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (model, vector, weight, half_life_days, reference_day),
+        )
 
 
 def record_download(
     item_id: str,
     size_bytes: int,
     downloaded_at: Optional[str] = None,
+    status: str = "complete",
     db_path: Optional[Path] = None,
 ) -> None:
-    """Record a download for an item."""
+    """Record a download attempt for an item.
+
+    ``size_bytes`` is what the attempt transferred; ``status`` is
+    ``"partial"`` when the file was left as a ``.part`` to resume.
+    """
     with get_connection(db_path) as conn:
         conn.execute(
             """
-            INSERT INTO downloads (item_id, size_bytes, downloaded_at)
-            VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            INSERT INTO downloads (item_id, size_bytes, downloaded_at, status)
+            VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
             """,
-            (item_id, size_bytes, downloaded_at),
+            (item_id, size_bytes, downloaded_at, status),
         )
 
 
+def get_download_status(item_id: str, db_path: Optional[Path] = None) -> Optional[str]:
+    """Return the status of the latest download attempt for ``item_id``."""
+    with get_connection(db_path) as conn:
+        row = conn.execute(LATEST_DOWNLOAD_STATUS, {"item_id": item_id}).fetchone()
+    return row["status"] if row else None
+
+
 def list_items(limit: int = 100, db_path: Optional[Path] = None) -> List[sqlite3.Row]:
     """Return a list of items ordered by ``added_at`` descending."""
     with get_connection(db_path) as conn:
@@ -124,30 +1110,284 @@ def list_items(limit: int = 100, db_path: Optional[Path] = None) -> List[sqlite3
         return cur.fetchall()
 
 
+def known_item_ids(item_ids: Iterable[str], db_path: Optional[Path] = None) -> set[str]:
+    """Return which of ``item_ids`` are already in ``items``, in one query."""
+    ids = list(item_ids)
+    if not ids:
+        return set()
+    with get_connection(db_path) as conn:
+        rows = conn.execute(
+            "SELECT id FROM items WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),),
+        )
+        return {row[0] for row in rows}
+
+
+def iter_item_ids(
+    after_rowid: int = 0, db_path: Optional[Path] = None
+) -> Iterator[tuple[int, str]]:
+    """Yield ``(rowid, id)`` for items stored after ``after_rowid``."""
+    with get_connection(db_path) as conn:
+        yield from conn.execute(
+            "SELECT rowid, id FROM items WHERE rowid > ? ORDER BY rowid",
+            (after_rowid,),
+        )
+
+
+def count_items(db_path: Optional[Path] = None) -> int:
+    """Return the number of rows in ``items``."""
+    with get_connection(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
 def list_items_today(
     limit: int = 100, db_path: Optional[Path] = None
 ) -> List[sqlite3.Row]:
-    """Return today's items ordered by ``added_at`` descending."""
+    """Return today's (UTC) items ordered by ``added_at`` descending."""
+    start, end = utc_day_bounds()
     with get_connection(db_path) as conn:
         cur = conn.execute(
-            """
-            SELECT * FROM items
-            WHERE date(added_at, 'utc') = date('now','utc')
-            ORDER BY added_at DESC
-            LIMIT ?
-            """,
-            (limit,),
+            ITEMS_ADDED_BETWEEN, {"start": start, "end": end, "limit": limit}
         )
         return cur.fetchall()
 
 
+def downloaded_bytes_today(db_path: Optional[Path] = None) -> int:
+    """Return bytes recorded in ``downloads`` today (UTC)."""
+    start, end = utc_day_bounds()
+    with get_connection(db_path) as conn:
+        row = conn.execute(
+            DOWNLOADED_BYTES_BETWEEN, {"start": start, "end": end}
+        ).fetchone()
+    return int(row[0] or 0)
+
+
 def list_ratings(item_id: str, db_path: Optional[Path] = None) -> List[sqlite3.Row]:
     """Return all ratings for a given ``item_id``."""
     with get_connection(db_path) as conn:
-        cur = conn.execute(
+        return conn.execute(RATINGS_FOR_ITEM, {"item_id": item_id}).fetchall()
+
+
+def _fold(word: str) -> str:
+    """Casefold and strip diacritics, as the FTS tokenizer does."""
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _fts_query(words: List[str]) -> str:
+    """Require every word, the last one (if longer than a letter) as a prefix.
+
+    Quoting each word keeps FTS5 syntax in user input inert.
+    """
+    if not words:
+        return ""
+    last = f'"{words[-1]}"' + ("*" if len(words[-1]) > 1 else "")
+    return " ".join([f'"{w}"' for w in words[:-1]] + [last])
+
+
+def _snippet(text: str, words: List[str]) -> Optional[str]:
+    """Return up to ``SNIPPET_WORDS`` words of ``text`` around its first hit.
+
+    Hits are wrapped in ``SNIPPET_OPEN``/``SNIPPET_CLOSE``; ``None`` means
+    ``text`` has no hit. Built here rather than with FTS5's ``snippet()``,
+    which reloads a common term's whole doclist for every result row.
+    """
+    terms = [_fold(w) for w in words]
+
+    def hit(token: str) -> bool:
+        token = _fold(token)
+        if token in terms:
+            return True
+        return len(terms[-1]) > 1 and token.startswith(terms[-1])
+
+    tokens = list(re.finditer(r"\w+", text or ""))
+    hits = {i for i, m in enumerate(tokens) if hit(m.group())}
+    if not hits:
+        return None
+    lo = max(0, min(hits) - SNIPPET_WORDS // 4)
+    hi = min(len(tokens), lo + SNIPPET_WORDS)
+    parts = ["…" if lo else ""]
+    pos = tokens[lo].start() if lo else 0
+    for i in range(lo, hi):
+        m = tokens[i]
+        parts.append(text[pos : m.start()])
+        word = m.group()
+        parts.append(f"{SNIPPET_OPEN}{word}{SNIPPET_CLOSE}" if i in hits else word)
+        pos = m.end()
+    parts.append(text[pos:] if hi == len(tokens) else "…")
+    return "".join(parts)
+
+
+def search_items(
+    text: str, limit: int = 20, offset: int = 0, db_path: Optional[Path] = None
+) -> List[dict]:
+    """Return items matching ``text``, best BM25 rank first.
+
+    Each result has ``id``, ``title``, ``description``, ``url`` and a
+    ``snippet`` (description preferred, else title) with hits wrapped in
+    ``SNIPPET_OPEN``/``SNIPPET_CLOSE``. Words matching most of the catalog
+    are ranked among their ``SEARCH_CANDIDATES`` newest matches only; see
+    :func:`search_truncated`.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return []
+    with get_connection(db_path) as conn:
+        rows = conn.execute(
+            SEARCH_ITEMS,
+            {
+                "query": _fts_query(words),
+                "candidates": SEARCH_CANDIDATES,
+                "limit": limit,
+                "offset": offset,
+            },
+        ).fetchall()
+    results = []
+    for row in rows:
+        result = dict(row)
+        result["snippet"] = (
+            _snippet(row["description"], words)
+            or _snippet(row["title"], words)
+            or row["title"]
+        )
+        results.append(result)
+    return results
+
+
+def search_truncated(text: str, db_path: Optional[Path] = None) -> bool:
+    """Return whether ``text`` matches more items than ``search_items`` ranks.
+
+    Counts at most ``SEARCH_CANDIDATES + 1`` matches, so this stays cheap for
+    words found in most of the catalog.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return False
+    with get_connection(db_path) as conn:
+        count = conn.execute(
+            SEARCH_MATCHES,
+            {"query": _fts_query(words), "limit": SEARCH_CANDIDATES + 1},
+        ).fetchone()[0]
+    return count > SEARCH_CANDIDATES
+
+
+def get_rating_stats(
+    item_ids: Iterable[str], db_path: Optional[Path] = None
+) -> Dict[str, sqlite3.Row]:
+    """Return ``count``, ``total``, ``mean`` and ``last_rated_at`` per rated item."""
+    ids = list(item_ids)
+    if not ids:
+        return {}
+    with get_connection(db_path) as conn:
+        rows = conn.execute(
             """
-            SELECT rating, rated_at FROM ratings WHERE item_id = ? ORDER BY rated_at
+            SELECT * FROM rating_stats
+            WHERE item_id IN (SELECT value FROM json_each(?))
             """,
-            (item_id,),
+            (json.dumps(ids),),
+        ).fetchall()
+    return {row["item_id"]: row for row in rows}
+
+
+def get_embeddings(model: str, db_path: Optional[Path] = None) -> List[sqlite3.Row]:
+    """Return stored ``(item_id, vector)`` rows for ``model``."""
+    with get_connection(db_path) as conn:
+        cur = conn.execute(
+            "SELECT item_id, vector FROM embeddings WHERE model = ?",
+            (model,),
         )
         return cur.fetchall()
+
+
+def store_embeddings(
+    rows: Iterable[tuple[str, bytes]],
+    model: str,
+    db_path: Optional[Path] = None,
+) -> None:
+    """Persist ``(item_id, vector)`` rows computed with ``model``.
+
+    Stored preferences are adjusted for any rated item whose vector changes,
+    under the write lock so two writers cannot retarget from the same vector.
+    """
+    rows = list(rows)
+    with transaction(db_path) as conn:
+        rated = set()
+        ids = [item_id for item_id, _ in rows]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            rated.update(
+                row[0]
+                for row in conn.execute(
+                    f"SELECT item_id FROM rating_stats WHERE item_id IN ({marks})",
+                    chunk,
+                )
+            )
+        for item_id, vector in rows:
+            if item_id in rated:
+                _retarget_preferences(conn, item_id, model, vector)
+        conn.executemany(
+            """
+            INSERT INTO embeddings (item_id, model, vector) VALUES (?, ?, ?)
+            ON CONFLICT(item_id) DO UPDATE
+            SET model = excluded.model, vector = excluded.vector
+            """,
+            ((item_id, model, vector) for item_id, vector in rows),
+        )
+
+
+def clear_embeddings(db_path: Optional[Path] = None) -> None:
+    """Delete every stored embedding and the preferences built from them."""
+    with get_connection(db_path) as conn:
+        conn.execute("DELETE FROM embeddings")
+        conn.execute("DELETE FROM preferences")
+        # Rankings may change even though items and ratings did not
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+
+def drop_embeddings_except(model: str, db_path: Optional[Path] = None) -> int:
+    """Delete vectors and preferences not built with ``model``.
+
+    Returns the number of vectors removed.
+    """
+    with get_connection(db_path) as conn:
+        cur = conn.execute("DELETE FROM embeddings WHERE model IS NOT ?", (model,))
+        conn.execute("DELETE FROM preferences WHERE model IS NOT ?", (model,))
+        if cur.rowcount:
+            conn.execute(
+                "UPDATE meta SET value = value + 1 WHERE key = 'data_version'"
+            )
+        return cur.rowcount
+
+
+def get_meta(key: str, db_path: Optional[Path] = None):
+    """Return the ``meta`` value stored under ``key`` or ``None``."""
+    with get_connection(db_path) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(key: str, value, db_path: Optional[Path] = None) -> None:
+    """Store ``value`` under ``key`` in the ``meta`` table."""
+    with get_connection(db_path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+
+def data_version(db_path: Optional[Path] = None) -> int:
+    """Return a counter that changes whenever ``items`` or ``ratings`` change."""
+    with get_connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'data_version'"
+        ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def embedding_version(db_path: Optional[Path] = None) -> int:
+    """Return a counter that changes whenever a stored vector changes."""
+    with get_connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'embedding_version'"
+        ).fetchone()
+    return int(row[0]) if row else 0
@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import hashlib
+import math
+import os
+import queue
 import random
+import threading
 import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from urllib.parse import urlsplit
 
 import logging
 
@@ -11,27 +24,79 @@ import requests
 
 from . import USER_AGENT
 
-from . import db
+from . import db, metacache
 from .config import Config
+from .ratelimit import RateLimiter, TokenBucket
+from .session import get_session
+from .writer import StreamWriter, preallocate
 
 HEADERS = {"User-Agent": USER_AGENT}
 
 
 logger = logging.getLogger(__name__)
 
+# Retries of a request answered with 429 before the response is returned
+RATE_LIMIT_RETRIES = 3
 
-def _sleep_for_rps(rps_limit: float) -> None:
-    """Sleep enough to respect requests-per-second limit."""
-    if rps_limit <= 0:
-        return
-    delay = max(0.0, 1.0 / rps_limit)
-    if delay:
-        logger.debug("sleeping %.2fs for rps", delay)
-        time.sleep(delay)
+# Seconds between checks for new candidates while downloads are running
+PIPELINE_POLL = 0.05
+
+# One token bucket per host, shared by every worker thread
+_LIMITER = RateLimiter(rate=1.0)
+
+
+def _sleep_for_rps(rps_limit: float, host: str = "archive.org") -> float:
+    """Wait for a token from ``host``'s bucket; return seconds throttled."""
+    if rps_limit != _LIMITER.rate:
+        _LIMITER.configure(rps_limit)
+    waited = _LIMITER.acquire(host)
+    if waited:
+        logger.debug("throttled %.2fs for %s", waited, host)
+    return waited
+
+
+def _get(
+    url: str,
+    cfg: Config,
+    headers: Optional[Dict[str, str]] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """GET ``url`` on the pooled session under the host's rate limit.
+
+    Responses answered with 429 are retried after the limiter backs off.
+    """
+    host = urlsplit(url).hostname or ""
+    if cfg.rps_burst != _LIMITER.burst:
+        _LIMITER.configure(cfg.rps_limit, cfg.rps_burst)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        _sleep_for_rps(cfg.rps_limit, host)
+        start = time.perf_counter()
+        res = get_session(cfg).get(
+            url, timeout=cfg.timeout, headers={**HEADERS, **(headers or {})}, **kwargs
+        )
+        _LIMITER.observe(
+            host,
+            res.status_code,
+            getattr(res, "headers", None),
+            time.perf_counter() - start,
+        )
+        if res.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+            return res
+        if hasattr(res, "close"):
+            res.close()
+    return res
+
+
+def rate_limit_stats() -> Dict[str, float]:
+    """Return request counts and seconds spent throttled vs on the network."""
+    return _LIMITER.stats()
 
 
 def _best_h264_file(files: List[Dict[str, Any]]) -> tuple[str, int] | None:
-    """Return (name, size) of the largest playable H.264 file."""
+    """Return (name, size) of the largest playable H.264 file.
+
+    In-memory counterpart of ``db.best_item_file`` for raw IA listings.
+    """
     best: tuple[str, int] | None = None
     for info in files:
         name = info.get("name")
@@ -45,12 +110,136 @@ def _best_h264_file(files: List[Dict[str, Any]]) -> tuple[str, int] | None:
     return best
 
 
-def fetch_candidates(cfg: Config) -> List[str]:
-    """Fetch and persist daily candidate items.
+def _parse_duration(value: Any) -> Optional[float]:
+    """Return seconds from IA's ``length`` field (``"83.4"`` or ``"01:23"``)."""
+    if value in (None, ""):
+        return None
+    try:
+        parts = [float(p) for p in str(value).split(":")]
+    except ValueError:
+        return None
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
 
-    Returns a list of item identifiers inserted into the database.
+
+def _parse_files(files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalize IA's ``files`` array into ``item_files`` rows."""
+    rows = []
+    for info in files:
+        name = info.get("name")
+        if not name:
+            continue
+        rows.append(
+            {
+                "name": name,
+                "format": str(info.get("format", "")),
+                "size_bytes": int(info.get("size") or 0) or None,
+                "md5": info.get("md5"),
+                "sha1": info.get("sha1"),
+                "duration": _parse_duration(info.get("length")),
+            }
+        )
+    return rows
+
+
+def _download_url(identifier: str, file_name: str) -> str:
+    return f"https://archive.org/download/{identifier}/{file_name}"
+
+
+def _choose_file(
+    identifier: str, files: List[Dict[str, Any]], cfg: Config
+) -> Optional[Any]:
+    """Store ``files`` for ``identifier`` and return the best playable one."""
+    db.store_item_files(identifier, files)
+    best = db.best_item_file(identifier, cfg.playable_formats)
+    if best is None:
+        db.store_item_files(identifier, [])
+    return best
+
+
+def _metadata(identifier: str, cfg: Config, force: bool = False) -> Optional[Dict[str, Any]]:
+    """Return the ``/metadata`` document for ``identifier``, cached on disk.
+
+    Fresh cache entries are returned without a request; stale ones (or all,
+    with ``force``) are revalidated with a conditional GET. If revalidation
+    fails the cached body is still returned, and retried on the next call.
     """
+    cache = metacache.get_cache(cfg)
+    entry = cache.get(identifier) if cache else None
+    if entry is not None and not force and cache.is_fresh(entry):
+        cache.record("hit")
+        return entry.body
+    res = _get(
+        f"https://archive.org/metadata/{identifier}",
+        cfg,
+        headers=entry.validators() if entry else None,
+    )
+    if res.status_code == 304 and entry is not None:
+        cache.record("revalidated")
+        cache.put(identifier, entry.body, entry.etag, entry.last_modified)
+        return entry.body
+    if cache:
+        cache.record("miss")
+    if res.status_code != 200:
+        if entry is not None:
+            logger.warning(
+                "[!] revalidating %s failed (HTTP %d), using cached metadata",
+                identifier,
+                res.status_code,
+            )
+            return entry.body
+        return None
+    body = res.json()
+    if cache:
+        headers = getattr(res, "headers", None) or {}
+        cache.put(identifier, body, headers.get("ETag"), headers.get("Last-Modified"))
+    return body
+
 
+def _enrich(item: Dict[str, Any], cfg: Config) -> Optional[List[Dict[str, Any]]]:
+    """Return the parsed file listing for a search doc via ``/metadata``."""
+    identifier = item["identifier"]
+    logger.debug("fetching metadata for %s", identifier)
+    meta = _metadata(identifier, cfg)
+    if meta is None:
+        return None
+    return _parse_files(meta.get("files", []))
+
+
+def refresh_metadata(
+    item_ids: List[str], cfg: Config, force: bool = False
+) -> Dict[str, int]:
+    """Revalidate cached metadata for ``item_ids`` and update changed files.
+
+    Returns counts of items checked, whose best file changed, and that no
+    longer have a playable file.
+    """
+    counts = {"checked": 0, "updated": 0, "missing": 0}
+
+    def check(item_id: str) -> Optional[List[Dict[str, Any]]]:
+        meta = _metadata(item_id, cfg, force=force)
+        return None if meta is None else _parse_files(meta.get("files", []))
+
+    with ThreadPoolExecutor(max_workers=max(1, cfg.fetch_workers)) as pool:
+        for item_id, files in zip(item_ids, pool.map(check, item_ids)):
+            counts["checked"] += 1
+            if files is None:
+                continue
+            best = _choose_file(item_id, files, cfg)
+            if best is None:
+                counts["missing"] += 1
+                continue
+            url = _download_url(item_id, best["name"])
+            if db.update_item_file(item_id, url, best["size_bytes"]):
+                counts["updated"] += 1
+    _log_stats(cfg)
+    return counts
+
+
+def _search(cfg: Config) -> List[Dict[str, Any]]:
+    """Return the AdvancedSearch docs for today's query."""
     keywords = " OR ".join(cfg.seed_keywords)
     query = f"({keywords}) AND duration:[{cfg.min_seconds} TO {cfg.max_seconds}]"
     logger.info("[i] query %s", query)
@@ -58,103 +247,566 @@ def fetch_candidates(cfg: Config) -> List[str]:
     params = {
         "q": query,
         "fl[]": ["identifier", "title", "description", "duration"],
-        "rows": cfg.daily_candidates,
+        "rows": math.ceil(cfg.daily_candidates * max(1.0, cfg.search_overfetch)),
         "output": "json",
         "sort[]": f"random_{random.randint(0, 99999)}",
     }
 
-    _sleep_for_rps(cfg.rps_limit)
-    res = requests.get(
-        "https://archive.org/advancedsearch.php",
-        params=params,
-        timeout=cfg.timeout,
-        headers=HEADERS,
-    )
+    res = _get("https://archive.org/advancedsearch.php", cfg, params=params)
     res.raise_for_status()
     docs = res.json()["response"]["docs"]
     logger.debug("received %d docs", len(docs))
+    return docs
 
-    inserted: List[str] = []
 
-    for item in docs:
-        identifier = item["identifier"]
-        logger.debug("fetching metadata for %s", identifier)
-        _sleep_for_rps(cfg.rps_limit)
-        meta = requests.get(
-            f"https://archive.org/metadata/{identifier}",
-            timeout=cfg.timeout,
-            headers=HEADERS,
+_PREFILTER_STATS = {"search_hits": 0, "known": 0}
+
+
+def _new_docs(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop search hits already in the DB before any ``/metadata`` call.
+
+    One indexed ``IN`` query per search page costs the same at any catalog
+    size, so nothing is loaded up front.
+    """
+    known = db.known_item_ids(doc["identifier"] for doc in docs)
+    fresh = [doc for doc in docs if doc["identifier"] not in known]
+    _PREFILTER_STATS["search_hits"] += len(docs)
+    _PREFILTER_STATS["known"] += len(known)
+    if known:
+        logger.info(
+            "[i] skipped %d of %d known search hits (%d metadata requests saved)",
+            len(known),
+            len(docs),
+            _PREFILTER_STATS["known"],
         )
-        if meta.status_code != 200:
-            continue
-        files = meta.json().get("files", [])
-        best = _best_h264_file(files)
-        if not best:
+    return fresh
+
+
+def prefilter_stats() -> Dict[str, int]:
+    """Return search hits seen and metadata lookups skipped as known."""
+    return dict(_PREFILTER_STATS)
+
+
+def _resolve(
+    docs: List[Dict[str, Any]], cfg: Config, limit: Optional[int] = None
+) -> Iterator[tuple[int, str]]:
+    """Enrich ``docs`` concurrently, yielding ``(position, id)`` per insert.
+
+    Lookups that finish together are inserted as one batch and yielded
+    straight away; at most two lookups per worker are in flight so a slow
+    consumer holds the producer back. With ``limit`` no further lookups are
+    started once that many items are inserted or pending.
+    """
+    workers = max(1, cfg.fetch_workers)
+    target = len(docs) if limit is None else limit
+    produced = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: Dict[Future, int] = {}
+        queued = iter(enumerate(docs))
+        while True:
+            while len(pending) < workers * 2 and produced + len(pending) < target:
+                nxt = next(queued, None)
+                if nxt is None:
+                    break
+                pending[pool.submit(_enrich, nxt[1], cfg)] = nxt[0]
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            batch: Dict[int, List[Dict[str, Any]]] = {}
+            for future in done:
+                pos = pending.pop(future)
+                files = future.result()
+                if files:
+                    batch[pos] = files
+            stored = set(_store_candidates([(docs[p], f) for p, f in batch.items()], cfg))
+            for pos in sorted(batch):
+                if docs[pos]["identifier"] in stored:
+                    produced += 1
+                    yield pos, docs[pos]["identifier"]
+
+
+def _store_candidates(
+    resolved: List[tuple[Dict[str, Any], List[Dict[str, Any]]]], cfg: Config
+) -> List[str]:
+    """Insert search docs with their best playable file; return their ids.
+
+    Full file listings go to ``item_files`` and the items are upserted in a
+    single transaction. Docs without a playable file are skipped and their
+    listings cleared.
+    """
+    if not resolved:
+        return []
+    listings = {doc["identifier"]: files for doc, files in resolved}
+    db.replace_item_files(listings)
+    best = db.best_item_files(listings, cfg.playable_formats)
+    unplayable = {identifier: [] for identifier in listings if identifier not in best}
+    db.replace_item_files(unplayable)
+    rows = []
+    for doc, _ in resolved:
+        identifier = doc["identifier"]
+        if identifier not in best:
             continue
-        file_name, _ = best
-        url = f"https://archive.org/download/{identifier}/{file_name}"
-        title = item.get("title", "")
-        description = item.get("description", "") or ""
-        duration = int(float(item.get("duration") or 0))
-        db.insert_item(identifier, title, description, duration, url)
-        logger.debug("inserted %s", identifier)
-        inserted.append(identifier)
+        rows.append(
+            {
+                "id": identifier,
+                "title": doc.get("title", ""),
+                "description": doc.get("description", "") or "",
+                "duration": int(float(doc.get("duration") or 0)),
+                "url": _download_url(identifier, best[identifier]["name"]),
+                "size_bytes": best[identifier]["size_bytes"],
+            }
+        )
+    db.insert_items(rows)
+    logger.debug("inserted %d items", len(rows))
+    return [row["id"] for row in rows]
+
+
+def _log_stats(cfg: Config) -> None:
+    cache = metacache.get_cache(cfg)
+    if cache:
+        cached = cache.stats()
+        logger.info(
+            "[i] metadata cache: %d hits, %d revalidated, %d misses (%.0f%% hit rate)",
+            cached["hits"],
+            cached["revalidated"],
+            cached["misses"],
+            100 * cached["hit_rate"],
+        )
+    stats = rate_limit_stats()
+    logger.info(
+        "[i] %d requests: %.2fs on the network (%.0f ms each), %.2fs throttled",
+        stats["requests"],
+        stats["network_seconds"],
+        1000 * stats["network_seconds"] / max(stats["responses"], 1),
+        stats["throttled_seconds"],
+    )
+
+
+def fetch_candidates(cfg: Config) -> List[str]:
+    """Fetch and persist daily candidate items.
+
+    Returns a list of item identifiers inserted into the database, in search
+    order.
+    """
+    docs = _new_docs(_search(cfg))
+    resolved = _resolve(docs, cfg, limit=cfg.daily_candidates)
+    inserted = [identifier for _, identifier in sorted(resolved)]
     logger.info("[i] inserted %d items", len(inserted))
+    _log_stats(cfg)
+    _index_new_items(inserted, cfg)
     return inserted
 
 
+def _index_new_items(item_ids: List[str], cfg: Config) -> None:
+    """Add freshly inserted items to the IVF index when one exists.
+
+    Small catalogs are ranked by exact search and have no index, so this is
+    a no-op until ``recommend`` has built one.
+    """
+    from . import ann
+
+    if not item_ids or not ann.index_path().exists():
+        return
+    from . import recommend
+
+    marks = ",".join("?" * len(item_ids))
+    with db.get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT id, title, description FROM items WHERE id IN ({marks})",
+            item_ids,
+        ).fetchall()
+    recommend.index_items(rows, cfg)
+
+
 def _daily_downloaded_bytes() -> int:
     """Return sum of bytes downloaded today (UTC)."""
-    with db.get_connection() as conn:
-        cur = conn.execute(
-            "SELECT COALESCE(SUM(size_bytes),0) FROM downloads "
-            "WHERE date(downloaded_at, 'utc') = date('now','utc')"
+    return db.downloaded_bytes_today()
+
+
+class CapBudget:
+    """Bytes still allowed under the daily cap, shared by download workers.
+
+    Each download reserves its expected size up front; bytes beyond the
+    reservation are drawn from the free pool chunk by chunk, so concurrent
+    transfers can never add up to more than the cap.
+    """
+
+    def __init__(self, remaining: int) -> None:
+        self.free = max(0, remaining)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_today(cls, cfg: Config) -> "CapBudget":
+        """Return the budget left for today under ``download_cap_gb``."""
+        return cls(int(cfg.download_cap_gb * 1024**3) - _daily_downloaded_bytes())
+
+    def reserve(self, nbytes: int) -> Optional["Reservation"]:
+        """Set aside ``nbytes``; ``None`` when the cap has no room for them."""
+        with self._lock:
+            if self.free <= 0 or nbytes > self.free:
+                return None
+            self.free -= nbytes
+        return Reservation(self, nbytes)
+
+    def _draw(self, nbytes: int) -> bool:
+        with self._lock:
+            if nbytes > self.free:
+                return False
+            self.free -= nbytes
+            return True
+
+    def _refund(self, nbytes: int) -> None:
+        with self._lock:
+            self.free += nbytes
+
+
+class Reservation:
+    """Cap headroom held by one download."""
+
+    def __init__(self, budget: CapBudget, nbytes: int) -> None:
+        self.budget = budget
+        self.held = nbytes
+
+    def take(self, nbytes: int) -> bool:
+        """Charge ``nbytes`` just transferred; ``False`` if over the cap."""
+        if nbytes <= self.held:
+            self.held -= nbytes
+            return True
+        extra = nbytes - self.held
+        if not self.budget._draw(extra):
+            return False
+        self.held = 0
+        return True
+
+    def release(self) -> None:
+        """Return whatever was reserved but not transferred."""
+        if self.held:
+            self.budget._refund(self.held)
+            self.held = 0
+
+
+def _hashers(expected: Any) -> Dict[str, Any]:
+    """Return a hasher for one listed checksum, preferring sha1.
+
+    IA usually lists both; sha1 is hardware-accelerated on current CPUs and
+    measured about twice as fast as md5.
+    """
+    for algo in ("sha1", "md5"):
+        if expected[algo]:
+            return {algo: hashlib.new(algo)}
+    return {}
+
+
+def _seed_hashers(hashers: Dict[str, Any], path: Path, nbytes: int) -> None:
+    """Feed the first ``nbytes`` of an existing partial file to ``hashers``."""
+    if not hashers or not nbytes:
+        return
+    with path.open("rb") as f:
+        remaining = nbytes
+        while remaining:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            for hasher in hashers.values():
+                hasher.update(block)
+            remaining -= len(block)
+
+
+def _verify(path: Path, expected: Any, hashers: Dict[str, Any]) -> None:
+    """Check a finished download against its listed size and checksum.
+
+    A checksum mismatch deletes the file, since resuming it would only
+    extend the corruption.
+    """
+    size = path.stat().st_size
+    if expected["size_bytes"] and size != expected["size_bytes"]:
+        logger.warning(
+            "[!] %s is %d bytes, IA lists %d", path.name, size, expected["size_bytes"]
         )
-        row = cur.fetchone()
-        return int(row[0] or 0)
+    for algo, hasher in hashers.items():
+        if hasher.hexdigest() != expected[algo].lower():
+            path.unlink()
+            raise RuntimeError(f"{algo} mismatch for {path.name}")
+
+
+def _range_total(headers: Dict[str, str]) -> Optional[int]:
+    """Return the full size from a ``Content-Range`` header, if present."""
+    total = (headers or {}).get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
 
 
-def download_item(item_id: str, dst_dir: str | Path, cfg: Config) -> Path:
-    """Download ``item_id`` respecting daily cap and record size."""
-    dst_path = Path(dst_dir)
+def download_item(
+    item_id: str,
+    dst_dir: str | Path,
+    cfg: Config,
+    budget: Optional[CapBudget] = None,
+    bandwidth: Optional[TokenBucket] = None,
+) -> Path:
+    """Download ``item_id`` respecting daily cap and record size.
+
+    Data is streamed into ``<item_id>/<name>.part`` under ``dst_dir`` and
+    renamed once complete; the per-item directory keeps items whose IA files
+    share a name apart. A rerun
+    resumes the partial file with an HTTP ``Range`` request, so only newly
+    transferred bytes count toward ``download_cap_gb``. Concurrent callers
+    share one ``budget`` and, optionally, a ``bandwidth`` bucket in bytes/s.
+    """
+    if item_id in ("", ".", "..") or "/" in item_id or os.sep in item_id:
+        raise ValueError(f"unsafe item id {item_id!r}")
+    dst_path = Path(dst_dir) / item_id
     dst_path.mkdir(parents=True, exist_ok=True)
 
     with db.get_connection() as conn:
-        cur = conn.execute("SELECT url FROM items WHERE id = ?", (item_id,))
+        # Expected size and checksum come from the stored file listing
+        cur = conn.execute(
+            """
+            SELECT i.url, COALESCE(f.size_bytes, i.size_bytes) AS size_bytes,
+                   f.md5, f.sha1
+            FROM items i LEFT JOIN item_files f
+              ON f.item_id = i.id
+             AND i.url = 'https://archive.org/download/' || i.id || '/' || f.name
+            WHERE i.id = ?
+            """,
+            (item_id,),
+        )
         row = cur.fetchone()
     if not row:
         raise ValueError(f"item {item_id} not found in database")
     url = row["url"]
+    local = dst_path / Path(url).name
+    part = local.with_name(local.name + ".part")
+    if local.exists() and db.get_download_status(item_id) == "complete":
+        logger.info("[i] %s already downloaded", item_id)
+        return local
     logger.info("[i] downloading %s", item_id)
 
-    downloaded = _daily_downloaded_bytes()
-    cap_bytes = cfg.download_cap_gb * 1024**3
-    if downloaded >= cap_bytes:
+    if budget is None:
+        budget = CapBudget.for_today(cfg)
+    if budget.free <= 0:
         logger.warning("[!] cap reached before download")
         raise RuntimeError("daily download cap reached")
 
-    _sleep_for_rps(cfg.rps_limit)
-    r = requests.get(url, stream=True, timeout=cfg.timeout, headers=HEADERS)
-    r.raise_for_status()
+    offset = part.stat().st_size if part.exists() else 0
+    expected = max(0, (row["size_bytes"] or 0) - offset)
+    reservation = budget.reserve(expected)
+    if reservation is None:
+        logger.warning("[!] no cap headroom for %s (%d bytes)", item_id, expected)
+        raise RuntimeError("daily download cap reached")
+    try:
+        return _transfer(
+            item_id, url, local, part, offset, cfg, reservation, bandwidth, row
+        )
+    finally:
+        reservation.release()
 
-    local = dst_path / Path(url).name
-    size = 0
+
+def _transfer(
+    item_id: str,
+    url: str,
+    local: Path,
+    part: Path,
+    offset: int,
+    cfg: Config,
+    reservation: Reservation,
+    bandwidth: Optional[TokenBucket],
+    expected: Any,
+) -> Path:
+    """Stream ``url`` into ``part`` from ``offset`` and move it to ``local``.
+
+    ``expected`` carries the listed ``size_bytes``, ``md5`` and ``sha1``;
+    the finished file is checked against them before the rename. The body
+    is copied in ``download_chunk_kb`` blocks into preallocated space while
+    the checksum is computed on a side thread.
+    """
+    r = _get(
+        url, cfg, headers={"Range": f"bytes={offset}-"} if offset else None, stream=True
+    )
+    hashers = _hashers(expected)
+    if offset and r.status_code == 416:
+        # Nothing left past ``offset``: either the .part is whole or stale
+        r.close()
+        if _range_total(getattr(r, "headers", {})) == offset:
+            _seed_hashers(hashers, part, offset)
+            _verify(part, expected, hashers)
+            os.replace(part, local)
+            db.record_download(item_id, 0, status="complete")
+            return local
+        logger.warning("[!] discarding stale partial file %s", part)
+        part.unlink()
+        offset = 0
+        r = _get(url, cfg, stream=True)
+
+    def charge(n: int) -> None:
+        if not reservation.take(n):
+            logger.warning("[!] cap reached mid-download, kept %s", part)
+            raise RuntimeError("download cap reached while downloading")
+        if bandwidth is not None:
+            bandwidth.acquire(n)
+
+    writer: Optional[StreamWriter] = None
+    status = "partial"
+    start = time.perf_counter()
     try:
-        with local.open("wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if not chunk:
-                    continue
-                size += len(chunk)
-                if downloaded + size > cap_bytes:
-                    r.close()
-                    logger.warning("[!] cap reached mid-download")
-                    raise RuntimeError("download cap reached while downloading")
-                f.write(chunk)
-    except RuntimeError as e:
-        if "download cap reached while downloading" in str(e) and local.exists():
-            local.unlink()
-        raise
-
-    db.record_download(item_id, size)
+        r.raise_for_status()
+        if offset and r.status_code != 206:
+            logger.info("[i] server ignored Range, restarting %s", item_id)
+            offset = 0
+        elif offset:
+            logger.info("[i] resuming %s at byte %d", item_id, offset)
+            _seed_hashers(hashers, part, offset)
+        with part.open("r+b" if offset else "wb") as f:
+            f.seek(offset)
+            preallocated = preallocate(f, offset, expected["size_bytes"])
+            writer = StreamWriter(
+                f, int(cfg.download_chunk_kb * 1024), hashers.values()
+            )
+            try:
+                writer.copy(r, before_write=charge)
+            finally:
+                if preallocated:
+                    f.truncate(offset + writer.written)
+        _verify(part, expected, hashers)
+        os.replace(part, local)
+        status = "complete"
+    finally:
+        # Hands the connection back to the blocking pool on every path
+        r.close()
+        _LIMITER.record_network(time.perf_counter() - start)
+        # Charge only what this attempt transferred
+        size = writer.written if writer else 0
+        if size or status == "complete":
+            db.record_download(item_id, size, status=status)
+
     logger.info("[i] wrote %s bytes", size)
     return local
+
+
+class DownloadScheduler:
+    """Run downloads on ``download_workers`` threads under one daily cap.
+
+    Workers share a :class:`CapBudget`, so reservations are made against the
+    same headroom, and an optional aggregate ``download_bandwidth_mbps``
+    bucket.
+    """
+
+    def __init__(self, dst_dir: str | Path, cfg: Config) -> None:
+        self.dst_dir = dst_dir
+        self.cfg = cfg
+        self.budget = CapBudget.for_today(cfg)
+        rate = cfg.download_bandwidth_mbps * 125_000  # Mbit/s -> bytes/s
+        self.bandwidth = TokenBucket(rate, burst=rate) if rate > 0 else None
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, cfg.download_workers), thread_name_prefix="download"
+        )
+
+    def submit(self, item_id: str) -> Future:
+        """Queue ``item_id``; the future resolves to the local path."""
+        return self._pool.submit(
+            download_item, item_id, self.dst_dir, self.cfg, self.budget, self.bandwidth
+        )
+
+    def run(
+        self, item_ids: Iterable[str]
+    ) -> Iterator[tuple[str, Optional[Path], Optional[Exception]]]:
+        """Download ``item_ids``, yielding ``(id, path, error)`` as each ends."""
+        futures = {self.submit(item_id): item_id for item_id in item_ids}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], None if error else future.result(), error
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "DownloadScheduler":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class FetchPipeline:
+    """Stream search -> metadata -> download instead of phase by phase.
+
+    A producer thread runs the search and metadata stages, handing each
+    candidate to a bounded queue as soon as it is inserted; the caller's
+    thread feeds free download slots from that queue. A full queue stalls
+    the metadata stage, and downloads start while lookups are still running,
+    so a run takes about as long as its slowest stage. ``timings`` holds the
+    wall-clock seconds of each stage once :meth:`run` is exhausted.
+    """
+
+    _DONE = object()
+
+    def __init__(self, dst_dir: str | Path, cfg: Config) -> None:
+        self.dst_dir = dst_dir
+        self.cfg = cfg
+        self.fetched: List[str] = []
+        self.timings: Dict[str, float] = {}
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, cfg.pipeline_queue_size))
+        self._error: Optional[BaseException] = None
+
+    def _produce(self) -> None:
+        try:
+            start = time.perf_counter()
+            docs = _new_docs(_search(self.cfg))
+            self.timings["search"] = time.perf_counter() - start
+            start = time.perf_counter()
+            for _, identifier in _resolve(docs, self.cfg, self.cfg.daily_candidates):
+                self.fetched.append(identifier)
+                self._queue.put(identifier)
+            self.timings["metadata"] = time.perf_counter() - start
+            logger.info("[i] inserted %d items", len(self.fetched))
+            _index_new_items(self.fetched, self.cfg)
+        except BaseException as e:  # noqa: BLE001 - re-raised by run()
+            self._error = e
+        finally:
+            self._queue.put(self._DONE)
+
+    def run(self) -> Iterator[tuple[str, Optional[Path], Optional[Exception]]]:
+        """Yield ``(id, path, error)`` for each download as it finishes."""
+        start = time.perf_counter()
+        producer = threading.Thread(
+            target=self._produce, name="fetch-metadata", daemon=True
+        )
+        producer.start()
+        slots = max(1, self.cfg.download_workers)
+        inflight: Dict[Future, str] = {}
+        first_download: Optional[float] = None
+        finished = False
+        with DownloadScheduler(self.dst_dir, self.cfg) as scheduler:
+            while not finished or inflight:
+                # Only pull candidates when a download slot is free
+                while not finished and len(inflight) < slots:
+                    try:
+                        item = (
+                            self._queue.get_nowait() if inflight else self._queue.get()
+                        )
+                    except queue.Empty:
+                        break
+                    if item is self._DONE:
+                        finished = True
+                        break
+                    if first_download is None:
+                        first_download = time.perf_counter()
+                    inflight[scheduler.submit(item)] = item
+                if not inflight:
+                    continue
+                done, _ = wait(
+                    inflight, timeout=PIPELINE_POLL, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    item_id = inflight.pop(future)
+                    error = future.exception()
+                    yield item_id, None if error else future.result(), error
+        producer.join()
+        end = time.perf_counter()
+        if first_download is not None:
+            self.timings["download"] = end - first_download
+        self.timings["total"] = end - start
+        logger.info(
+            "[i] pipeline: %s",
+            ", ".join(f"{k} {v:.2f}s" for k, v in self.timings.items()),
+        )
+        _log_stats(self.cfg)
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,179 @@
+"""Compressed on-disk cache of IA ``/metadata`` responses.
+
+Entries live in a directory next to the SQLite DB, one gzip'd JSON file per
+identifier holding the body plus its ``ETag``/``Last-Modified`` validators.
+Within ``metadata_ttl_hours`` an entry is served without a request; after
+that it is revalidated with a conditional GET so unchanged items cost a 304.
+File mtimes record last use, and the least recently used entries are evicted
+once the directory grows past ``metadata_cache_mb``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import logging
+
+from . import db
+from .config import Config
+
+
+logger = logging.getLogger(__name__)
+
+# Evict down to this fraction of the size limit so eviction is not rerun on
+# every write
+EVICT_TO = 0.9
+
+
+def cache_path(db_path: Optional[Path] = None) -> Path:
+    """Return the cache directory that sits next to ``db_path``."""
+    return Path(db_path or db.DB_PATH).with_suffix(".metadata")
+
+
+@dataclass
+class Entry:
+    body: Dict[str, Any]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def validators(self) -> Dict[str, str]:
+        """Return conditional request headers for revalidation."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class MetadataCache:
+    """Size-bounded LRU of metadata bodies keyed by identifier."""
+
+    def __init__(self, root: Path, ttl_seconds: float, max_bytes: int) -> None:
+        self.root = root
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, identifier: str) -> Path:
+        digest = hashlib.sha1(identifier.encode()).hexdigest()
+        return self.root / digest[:2] / f"{digest}.json.gz"
+
+    def get(self, identifier: str) -> Optional[Entry]:
+        """Return the cached entry for ``identifier``, fresh or not."""
+        path = self._path(identifier)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return Entry(
+            data["body"], data.get("etag"), data.get("last_modified"), data["fetched_at"]
+        )
+
+    def is_fresh(self, entry: Entry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(
+        self,
+        identifier: str,
+        body: Dict[str, Any],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Store ``body`` atomically and evict old entries if over the limit."""
+        path = self._path(identifier)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        old = path.stat().st_size if path.exists() else 0
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += path.stat().st_size - old
+        self._maybe_evict()
+
+    def record(self, outcome: str) -> None:
+        """Count a lookup as ``"hit"``, ``"revalidated"`` or ``"miss"``."""
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "revalidated":
+                self.revalidated += 1
+            else:
+                self.misses += 1
+
+    def _maybe_evict(self) -> None:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self.root.glob("*/*.json.gz"))
+            if self._size <= self.max_bytes:
+                return
+            files = sorted(
+                (st.st_mtime, st.st_size, p)
+                for p in self.root.glob("*/*.json.gz")
+                for st in (p.stat(),)
+            )
+            target = self.max_bytes * EVICT_TO
+            evicted = 0
+            for _, size, path in files:
+                if self._size <= target:
+                    break
+                path.unlink(missing_ok=True)
+                self._size -= size
+                evicted += 1
+        logger.debug("evicted %d metadata cache entries", evicted)
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/revalidation/miss counts and the overall hit rate."""
+        with self._lock:
+            total = self.hits + self.revalidated + self.misses
+            return {
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.revalidated) / total if total else 0.0,
+            }
+
+
+_CACHES: Dict[Path, MetadataCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(cfg: Config) -> Optional[MetadataCache]:
+    """Return the cache for the current DB, or ``None`` when disabled."""
+    if cfg.metadata_cache_mb <= 0:
+        return None
+    root = cache_path()
+    with _CACHES_LOCK:
+        cache = _CACHES.get(root)
+        if cache is None:
+            cache = _CACHES[root] = MetadataCache(
+                root,
+                cfg.metadata_ttl_hours * 3600,
+                int(cfg.metadata_cache_mb * 1024**2),
+            )
+        cache.ttl = cfg.metadata_ttl_hours * 3600
+        cache.max_bytes = int(cfg.metadata_cache_mb * 1024**2)
+        return cache
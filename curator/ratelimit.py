@@ -0,0 +1,216 @@
+"""Token-bucket rate limiting shared by every HTTP call in ``curator.fetch``.
+
+Buckets refill continuously, so time spent waiting on the network counts
+toward the next request's allowance instead of being slept again. Waits are
+computed under a short lock and slept outside it, which makes the same
+bucket usable from threads and from asyncio tasks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Multiplicative slow-down on 429/503 and additive recovery per success
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.1
+MIN_RATE_FRACTION = 0.05
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Return seconds to wait from a ``Retry-After`` header value."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilling at ``rate`` tokens per second.
+
+    ``burst`` tokens may be spent back to back. Callers that find the
+    bucket empty reserve a future slot, so concurrent waiters are spaced
+    ``1 / rate`` apart rather than released together.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._stamp = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` now and return how long the caller must wait."""
+        with self._lock:
+            now = self._clock()
+            if self.rate <= 0:
+                return max(0.0, self._blocked_until - now)
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._stamp) * self.rate
+            )
+            self._stamp = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` are available; return seconds waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """Await until ``tokens`` are available; return seconds waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def set_rate(self, rate: float) -> None:
+        """Change the target rate, keeping any adaptive slow-down ratio."""
+        with self._lock:
+            if rate == self.base_rate:
+                return
+            ratio = self.rate / self.base_rate if self.base_rate > 0 else 1.0
+            self.base_rate = rate
+            self.rate = rate * ratio if rate > 0 else rate
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Slow down after a 429/503, pausing for ``retry_after`` seconds."""
+        with self._lock:
+            if self.base_rate > 0:
+                self.rate = max(
+                    self.base_rate * MIN_RATE_FRACTION, self.rate * BACKOFF_FACTOR
+                )
+            if retry_after:
+                self._blocked_until = max(
+                    self._blocked_until, self._clock() + retry_after
+                )
+            # Drop saved-up burst so the pause is not followed by a spike
+            self._tokens = min(self._tokens, 0.0)
+
+    def reward(self) -> None:
+        """Recover the rate additively after a successful request."""
+        with self._lock:
+            if self.base_rate > 0 and self.rate < self.base_rate:
+                self.rate = min(
+                    self.base_rate, self.rate + self.base_rate * RECOVERY_STEP
+                )
+
+
+class RateLimiter:
+    """Per-host token buckets plus throttling and network-time metrics."""
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.responses = 0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+        self.network_seconds = 0.0
+        self.penalties = 0
+
+    def bucket(self, host: str) -> TokenBucket:
+        """Return the bucket for ``host``, creating it on first use."""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def configure(self, rate: float, burst: Optional[float] = None) -> None:
+        """Apply a new default rate (and burst) to every bucket."""
+        with self._lock:
+            self.rate = rate
+            if burst is not None:
+                self.burst = burst
+            buckets = list(self._buckets.values())
+        for bucket in buckets:
+            bucket.set_rate(rate)
+            if burst is not None:
+                bucket.burst = max(1.0, burst)
+
+    def acquire(self, host: str, tokens: float = 1.0) -> float:
+        """Wait for ``host``'s bucket; return seconds throttled."""
+        return self._record_wait(self.bucket(host).acquire(tokens))
+
+    async def acquire_async(self, host: str, tokens: float = 1.0) -> float:
+        """Async variant of :meth:`acquire`."""
+        return self._record_wait(await self.bucket(host).acquire_async(tokens))
+
+    def _record_wait(self, waited: float) -> float:
+        with self._lock:
+            self.requests += 1
+            if waited > 0:
+                self.throttled_requests += 1
+                self.throttled_seconds += waited
+        return waited
+
+    def record_network(self, seconds: float) -> None:
+        """Add ``seconds`` spent waiting on the network to the metrics."""
+        with self._lock:
+            self.network_seconds += seconds
+
+    def observe(
+        self,
+        host: str,
+        status_code: int,
+        headers: Optional[Mapping[str, str]] = None,
+        elapsed: float = 0.0,
+    ) -> None:
+        """Feed a response back so 429/503 replies slow the host down."""
+        self.record_network(elapsed)
+        with self._lock:
+            self.responses += 1
+        bucket = self.bucket(host)
+        if status_code in (429, 503):
+            retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+            bucket.penalize(retry_after)
+            with self._lock:
+                self.penalties += 1
+            logger.warning(
+                "[!] %s answered %d, slowing to %.2f rps", host, status_code, bucket.rate
+            )
+        elif status_code < 400:
+            bucket.reward()
+
+    def stats(self) -> Dict[str, float]:
+        """Return a snapshot of request, throttle and network counters."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "responses": self.responses,
+                "throttled_requests": self.throttled_requests,
+                "throttled_seconds": self.throttled_seconds,
+                "network_seconds": self.network_seconds,
+                "penalties": self.penalties,
+            }
@@ -1,67 +1,695 @@
 from __future__ import annotations
 
-from typing import List, Dict
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
 
 import logging
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-from . import db
+from . import ann, db
+from .config import Config, load_config
 
 
 logger = logging.getLogger(__name__)
 
-# Embedding model (384-dim)
+# Default sentence-transformers model (384-dim)
 MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-_model = SentenceTransformer(MODEL)
+# Loaded on first use so importing this module stays cheap
+_model = None
+_model_name = MODEL
+_model_lock = threading.Lock()
 
+_TOKEN_RE = re.compile(r"\w+")
 
-def embed(text: str) -> np.ndarray:
-    """Return normalized 384-dimensional embedding for ``text``."""
+# Exact-path vectors: (db path, backend key, embedding version, rowids, matrix)
+_matrix_cache: Optional[tuple] = None
+_matrix_lock = threading.Lock()
+
+
+def _get_model(name: str = MODEL):
+    """Return the shared SentenceTransformer, loading it on first call."""
+    global _model, _model_name
+    if _model is None or _model_name != name:
+        with _model_lock:
+            if _model is None or _model_name != name:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info("[i] loading embedding model %s", name)
+                _model = SentenceTransformer(name)
+                _model_name = name
+    return _model
+
+
+class EmbeddingBackend:
+    """Turns texts into L2-normalized float32 vectors.
+
+    ``key`` names the vector space a backend produces. Stored vectors are
+    tagged with it, so changing backend, model or dtype makes them stale.
+    Vectors are stored as ``dtype`` (float32 or float16).
+    """
+
+    name = ""
+
+    def __init__(self, dtype: str = "float32") -> None:
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"unsupported embedding dtype {dtype!r}")
+
+    @property
+    def key(self) -> str:
+        raise NotImplementedError
+
+    def _suffix(self) -> str:
+        return "" if self.dtype == np.float32 else f":{self.dtype.name}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Return a ``(len(texts), dim)`` float32 matrix."""
+        raise NotImplementedError
+
+    def to_bytes(self, vec: np.ndarray) -> bytes:
+        return np.asarray(vec, dtype=self.dtype).tobytes()
+
+    def from_bytes(self, blob: bytes) -> np.ndarray:
+        return np.frombuffer(blob, dtype=self.dtype).astype(np.float32)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Transformer embeddings via ``sentence-transformers``."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model: str = MODEL, dtype: str = "float32") -> None:
+        super().__init__(dtype)
+        self.model = model
+
+    @property
+    def key(self) -> str:
+        return self.model + self._suffix()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vecs = _get_model(self.model).encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return np.asarray(vecs, dtype=np.float32)
+
+
+@lru_cache(maxsize=1 << 16)
+def _bucket(token: str, dim: int) -> tuple[int, float]:
+    """Return the signed hash bucket for ``token``."""
+    h = zlib.crc32(token.encode("utf-8"))
+    return h % dim, 1.0 if h & 0x80000000 else -1.0
+
+
+class HashingBackend(EmbeddingBackend):
+    """Weight-free hashed term-frequency vectors in pure NumPy.
+
+    Lower-cased word unigrams and bigrams are hashed into ``dim`` signed
+    buckets with sublinear ``1 + log(tf)`` weights. Nothing is downloaded
+    and vectors never depend on the rest of the catalog.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 384, dtype: str = "float32") -> None:
+        super().__init__(dtype)
+        self.dim = dim
+
+    @property
+    def key(self) -> str:
+        return f"hashing-{self.dim}" + self._suffix()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        for i, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            counts = Counter(tokens)
+            counts.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+            for token, tf in counts.items():
+                col, sign = _bucket(token, self.dim)
+                rows.append(i)
+                cols.append(col)
+                vals.append(sign * (1.0 + math.log(tf)))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(out, (rows, cols), vals)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+
+def get_backend(cfg: Optional[Config] = None) -> EmbeddingBackend:
+    """Return the embedding backend selected by ``cfg``."""
+    if cfg is None:
+        cfg = load_config()
+    if cfg.embedding_backend == SentenceTransformerBackend.name:
+        return SentenceTransformerBackend(
+            cfg.embedding_model or MODEL, cfg.embedding_dtype
+        )
+    if cfg.embedding_backend == HashingBackend.name:
+        return HashingBackend(cfg.embedding_dim, cfg.embedding_dtype)
+    raise ValueError(f"unknown embedding backend {cfg.embedding_backend!r}")
+
+
+def _batches(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Yield lists of at most ``size`` texts."""
+    it = iter(texts)
+    while batch := list(islice(it, max(1, size))):
+        yield batch
+
+
+def embed_batches(
+    texts: Iterable[str],
+    batch_size: int = 64,
+    workers: int = 1,
+    backend: Optional[EmbeddingBackend] = None,
+) -> Iterator[np.ndarray]:
+    """Stream ``texts`` through ``backend``, yielding one matrix per batch.
+
+    With ``workers > 1`` batches are encoded in a process pool; at most two
+    batches per worker are in flight so arbitrarily long iterables are
+    consumed lazily. Throughput is logged once the input is exhausted.
+    """
+    if backend is None:
+        backend = get_backend()
+    start = time.perf_counter()
+    count = 0
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: deque = deque()
+            for batch in _batches(texts, batch_size):
+                pending.append(pool.submit(backend.encode, batch))
+                if len(pending) >= workers * 2:
+                    vecs = pending.popleft().result()
+                    count += len(vecs)
+                    yield vecs
+            while pending:
+                vecs = pending.popleft().result()
+                count += len(vecs)
+                yield vecs
+    else:
+        for batch in _batches(texts, batch_size):
+            vecs = backend.encode(batch)
+            count += len(vecs)
+            yield vecs
+    elapsed = time.perf_counter() - start
+    if count:
+        logger.info(
+            "[i] embedded %d items in %.2fs (%.1f items/s, %s, batch=%d, workers=%d)",
+            count,
+            elapsed,
+            count / elapsed if elapsed else float("inf"),
+            backend.key,
+            batch_size,
+            workers,
+        )
+
+
+def embed_many(
+    texts: Iterable[str],
+    batch_size: int = 64,
+    workers: int = 1,
+    backend: Optional[EmbeddingBackend] = None,
+) -> np.ndarray:
+    """Return a ``(len(texts), dim)`` matrix of normalized embeddings."""
+    parts = list(embed_batches(texts, batch_size, workers, backend))
+    if not parts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(parts)
+
+
+def embed(text: str, backend: Optional[EmbeddingBackend] = None) -> np.ndarray:
+    """Return the normalized embedding for ``text``."""
     logger.debug("embedding text of length %d", len(text))
-    return _model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+    return embed_many([text], backend=backend)[0]
 
 
-def recommend(top_n: int) -> List[dict]:
-    """Return ``top_n`` items ranked by similarity to user preferences."""
-    logger.info("[i] computing recommendations")
+def _item_text(item) -> str:
+    """Return the text embedded for an item row."""
+    return f"{item['title']} {item['description'] or ''}".strip()
+
+
+def _sync_backend(backend: EmbeddingBackend) -> None:
+    """Drop vectors from a previous backend so the catalog is re-encoded.
+
+    The active backend key is recorded in ``meta``; on a switch every
+    stale vector, preference sum and the IVF index are discarded and the
+    next ``recommend`` re-embeds the catalog with the new backend.
+    """
+    if db.get_meta("embedding_model") == backend.key:
+        return
+    removed = db.drop_embeddings_except(backend.key)
+    if removed:
+        logger.info(
+            "[i] embedding backend is now %s, reindexing %d items",
+            backend.key,
+            removed,
+        )
+        ann.drop_index()
+    db.set_meta("embedding_model", backend.key)
+
+
+def index_items(items: Iterable, cfg: Optional[Config] = None) -> int:
+    """Encode ``items`` in batches and store their vectors.
+
+    When an IVF index exists the new vectors are added to it as well.
+    Returns the number of items embedded.
+    """
+    if cfg is None:
+        cfg = load_config()
+    backend = get_backend(cfg)
+    _sync_backend(backend)
+    pending = [(item["id"], _item_text(item)) for item in items]
+    if not pending:
+        return 0
+
+    index = ann.load_index(backend.key)
+    added: List[np.ndarray] = []
+    offset = 0
+    for vecs in embed_batches(
+        (text for _, text in pending),
+        cfg.embed_batch_size,
+        cfg.embed_workers,
+        backend,
+    ):
+        chunk = pending[offset : offset + len(vecs)]
+        offset += len(vecs)
+        db.store_embeddings(
+            (
+                (item_id, backend.to_bytes(vec))
+                for (item_id, _), vec in zip(chunk, vecs)
+            ),
+            backend.key,
+        )
+        if index is not None:
+            added.append(vecs)
+    logger.info("[i] stored %d new embeddings", offset)
+    if index is not None:
+        index.add(np.array([item_id for item_id, _ in pending]), np.vstack(added))
+        index.save(ann.index_path())
+    return offset
+
+
+def _missing_items(backend: EmbeddingBackend) -> List:
+    """Return items that have no stored vector for ``backend``.
+
+    Read from the ``embedding_pending`` queue, which triggers fill with new
+    items and with items whose vector was dropped (``db.insert_items`` drops
+    vectors whose text changed, ``_sync_backend`` those of an old backend),
+    so the cost follows the backlog rather than the catalog.
+    """
     with db.get_connection() as conn:
-        items = conn.execute("SELECT id, title, description FROM items").fetchall()
-        rated_rows = conn.execute("SELECT item_id, rating FROM ratings").fetchall()
-
-    # Aggregate ratings per item
-    rating_sum: Dict[str, float] = {}
-    rating_count: Dict[str, int] = {}
-    for row in rated_rows:
-        item_id = row["item_id"]
-        rating_sum[item_id] = rating_sum.get(item_id, 0.0) + row["rating"]
-        rating_count[item_id] = rating_count.get(item_id, 0) + 1
-
-    # Embed all items on demand
-    embeddings: Dict[str, np.ndarray] = {}
-    for item in items:
-        text = f"{item['title']} {item['description'] or ''}".strip()
-        embeddings[item["id"]] = embed(text)
-
-    dim = _model.get_sentence_embedding_dimension()
-    preference = np.zeros(dim, dtype=float)
-    weight_total = 0.0
-    for item_id, total_rating in rating_sum.items():
-        vec = embeddings.get(item_id)
-        if vec is None:
-            continue
-        weight = total_rating / rating_count[item_id]
-        preference += vec * weight
-        weight_total += weight
-    if weight_total:
-        preference /= weight_total
+        return conn.execute(
+            """
+            SELECT i.id, i.title, i.description FROM embedding_pending p
+            JOIN items i ON i.id = p.item_id
+            """
+        ).fetchall()
+
+
+def _load_matrix(
+    backend: EmbeddingBackend, key: str = "i.rowid"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(keys, matrix)`` for every vector stored by ``backend``.
+
+    ``matrix`` is a contiguous float32 array with one row per item and
+    ``keys`` holds the matching ``key`` column (``items.rowid`` by default).
+    """
+    with db.get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {key}, e.vector FROM embeddings e
+            JOIN items i ON i.id = e.item_id
+            WHERE e.model = ?
+            """,
+            (backend.key,),
+        ).fetchall()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+    keys = np.array([row[0] for row in rows])
+    flat = backend.from_bytes(b"".join(row[1] for row in rows))
+    return keys, flat.reshape(len(rows), -1)
+
+
+def _cached_matrix(backend: EmbeddingBackend) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``_load_matrix(backend)``, reading SQLite only when stale.
+
+    The arrays are kept in memory until ``db.embedding_version()`` moves,
+    so ratings and unchanged catalogs reuse them.
+    """
+    global _matrix_cache
+    # Read before loading: a write in between only makes the next call reload
+    stamp = (str(db.DB_PATH), backend.key, db.embedding_version())
+    with _matrix_lock:
+        cached = _matrix_cache
+    if cached is not None and cached[:3] == stamp:
+        return cached[3], cached[4]
+    rowids, matrix = _load_matrix(backend)
+    with _matrix_lock:
+        _matrix_cache = stamp + (rowids, matrix)
+    return rowids, matrix
+
+
+def _stored_count(backend: EmbeddingBackend) -> int:
+    """Return the number of items with a vector for ``backend``."""
+    with db.get_connection() as conn:
+        row = conn.execute(
+            "SELECT count FROM embedding_counts WHERE model = ?", (backend.key,)
+        ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def _ensure_index(
+    cfg: Config, backend: EmbeddingBackend, count: int
+) -> Optional[ann.IVFIndex]:
+    """Return the IVF index when ``count`` reaches ``cfg.ann_threshold``.
+
+    The index is (re)trained when missing, built for another backend or
+    when the catalog has doubled since training.
+    """
+    if count < cfg.ann_threshold:
+        return None
+    index = ann.load_index(backend.key)
+    if index is None or count > 2 * index.trained_size:
+        ids, matrix = _load_matrix(backend, "e.item_id")
+        index = ann.IVFIndex.train(backend.key, ids, matrix, cfg.ann_nlist)
+        index.save(ann.index_path())
+    return index
+
+
+def _rebuild_preference(
+    backend: EmbeddingBackend, dim: int, half_life: float
+) -> None:
+    """Recompute and store the preference sum by replaying every rating.
+
+    Only needed when no sum is stored yet or the half-life changed;
+    afterwards ``db.record_rating`` keeps it current.
+    """
+    if half_life <= 0:
+        _rebuild_preference_from_stats(backend, dim, half_life)
+        return
+    # Ratings recorded between the read and the store would be lost
+    with db.transaction() as conn:
+        rows = conn.execute(
+            """
+            SELECT r.item_id, r.rating, julianday(r.rated_at) AS day, e.vector
+            FROM ratings r
+            JOIN embeddings e ON e.item_id = r.item_id AND e.model = ?
+            ORDER BY r.rowid
+            """,
+            (backend.key,),
+        ).fetchall()
+        vector = np.zeros(dim, dtype=np.float32)
+        reference = None
+        weights = np.empty(len(rows), dtype=np.float64)
+        if rows:
+            counts: dict = {}
+            totals: dict = {}
+            days = np.empty(len(rows), dtype=np.float64)
+            for i, row in enumerate(rows):
+                item_id = row["item_id"]
+                count = counts.get(item_id, 0)
+                total = totals.get(item_id, 0.0)
+                old_mean = total / count if count else 0.0
+                counts[item_id] = count + 1
+                totals[item_id] = total + row["rating"]
+                weights[i] = totals[item_id] / counts[item_id] - old_mean
+                days[i] = row["day"]
+            reference = float(days.max())
+            if half_life > 0:
+                weights *= 0.5 ** ((reference - days) / half_life)
+            matrix = backend.from_bytes(b"".join(row["vector"] for row in rows))
+            vector = (weights @ matrix.reshape(len(rows), dim)).astype(np.float32)
+        db.store_preference(
+            backend.key, vector.tobytes(), float(weights.sum()), half_life, reference
+        )
+    logger.info("[i] rebuilt preference vector from %d ratings", len(rows))
+
+
+def _rebuild_preference_from_stats(
+    backend: EmbeddingBackend, dim: int, half_life: float
+) -> None:
+    """Rebuild an undecayed preference sum from ``rating_stats``.
+
+    Without decay an item's replayed deltas add up to its mean rating, so
+    one row per rated item is enough.
+    """
+    with db.transaction() as conn:
+        rows = conn.execute(
+            """
+            SELECT s.mean, julianday(s.last_rated_at) AS day, e.vector
+            FROM rating_stats s
+            JOIN embeddings e ON e.item_id = s.item_id AND e.model = ?
+            """,
+            (backend.key,),
+        ).fetchall()
+        vector = np.zeros(dim, dtype=np.float32)
+        weights = np.array([row["mean"] for row in rows], dtype=np.float64)
+        reference = None
+        if rows:
+            reference = max(row["day"] for row in rows)
+            matrix = backend.from_bytes(b"".join(row["vector"] for row in rows))
+            vector = (weights @ matrix.reshape(len(rows), dim)).astype(np.float32)
+        db.store_preference(
+            backend.key, vector.tobytes(), float(weights.sum()), half_life, reference
+        )
+    logger.info("[i] rebuilt preference vector from %d rated items", len(rows))
+
+
+def _preference_vector(
+    backend: EmbeddingBackend, dim: int, cfg: Config
+) -> np.ndarray:
+    """Return the normalized rating-weighted mean of rated item vectors.
+
+    The running float32 sum lives in the ``preferences`` table and is
+    updated on every rating, so the ratings log is only read on a rebuild.
+    """
+    half_life = cfg.preference_half_life_days
+    row = db.get_preference(backend.key)
+    if (
+        row is None
+        or (row["half_life_days"] or 0.0) != half_life
+        or len(row["vector"]) != dim * 4
+    ):
+        _rebuild_preference(backend, dim, half_life)
+        row = db.get_preference(backend.key)
+    preference = np.frombuffer(row["vector"], dtype=np.float32)
     norm = np.linalg.norm(preference) or 1.0
-    preference /= norm
+    return preference / norm
+
+
+def _top_indices(scores: np.ndarray, top_n: int) -> np.ndarray:
+    """Return indices of the ``top_n`` highest scores, best first."""
+    k = min(top_n, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _hydrate(keys: np.ndarray, column: str = "rowid") -> List:
+    """Fetch item rows whose ``column`` is in ``keys``, preserving order."""
+    if not len(keys):
+        return []
+    keys = keys.tolist()
+    marks = ",".join("?" * len(keys))
+    with db.get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT {column} AS k, id, title, description, url FROM items "
+            f"WHERE {column} IN ({marks})",
+            keys,
+        ).fetchall()
+    by_key = {row["k"]: row for row in rows}
+    return [by_key[k] for k in keys if k in by_key]
 
-    scored = [(float(np.dot(embeddings[row["id"]], preference)), row) for row in items]
-    scored.sort(key=lambda x: x[0], reverse=True)
+
+def reindex(cfg: Optional[Config] = None) -> int:
+    """Drop all stored embeddings and re-encode the catalog.
+
+    Returns the number of items embedded.
+    """
+    if cfg is None:
+        cfg = load_config()
+    backend = get_backend(cfg)
+    logger.info("[i] reindexing embeddings with %s", backend.key)
+    db.clear_embeddings()
+    ann.drop_index()
+    with db.get_connection() as conn:
+        items = conn.execute("SELECT id, title, description FROM items").fetchall()
+    count = index_items(items, cfg)
+    _ensure_index(cfg, backend, count)
+    return count
+
+
+def recommend(top_n: int, cfg: Optional[Config] = None) -> List[dict]:
+    """Return ``top_n`` items ranked by similarity to user preferences.
+
+    Scores are one matrix-vector product over the stored float32 vectors,
+    kept in memory between calls; only the winning rows are read back from SQLite. Catalogs of at least
+    ``cfg.ann_threshold`` items are searched through the IVF index instead.
+    """
+    if cfg is None:
+        cfg = load_config()
+    backend = get_backend(cfg)
+    logger.info("[i] computing recommendations")
+    # Encode only new or changed items, reusing stored vectors
+    _sync_backend(backend)
+    index_items(_missing_items(backend), cfg)
+
+    index = _ensure_index(cfg, backend, _stored_count(backend))
+    if index is not None:
+        preference = _preference_vector(backend, index.centroids.shape[1], cfg)
+        ids, _ = index.search(preference, top_n, cfg.ann_nprobe)
+        logger.info("[i] returning top %d recommendations (ivf)", top_n)
+        return _hydrate(ids, "id")
+
+    rowids, matrix = _cached_matrix(backend)
+    if not len(rowids):
+        return []
+    preference = _preference_vector(backend, matrix.shape[1], cfg)
+    scores = matrix @ preference
+    winners = _top_indices(scores, top_n)
 
     logger.info("[i] returning top %d recommendations", top_n)
-    return [row for _, row in scored[:top_n]]
+    return _hydrate(rowids[winners])
+
+
+def snapshot_path() -> Path:
+    """Return the on-disk recommendation snapshot next to the DB."""
+    return Path(db.DB_PATH).with_suffix(".recs.json")
+
+
+class RecommendationCache:
+    """Ranked recommendations cached against ``db.data_version()``.
+
+    The top ``size`` items are kept in memory and optionally mirrored to a
+    JSON snapshot so other processes can reuse them. Any write to ``items``
+    or ``ratings`` bumps the data version and marks the list stale, as does
+    a change of embedding backend or preference half-life.
+    """
+
+    def __init__(
+        self,
+        size: int = 100,
+        cfg: Optional[Config] = None,
+        snapshot: Optional[Path] = None,
+    ) -> None:
+        self.size = size
+        self.cfg = cfg
+        self.snapshot = snapshot
+        self._lock = threading.Lock()
+        self._key: Optional[tuple] = None
+        self._rows: List[dict] = []
+        self._thread: Optional[threading.Thread] = None
+        self._pending = False
+
+    def get(self, top_n: int, allow_stale: bool = False) -> List[dict]:
+        """Return ``top_n`` recommendations, recomputing only when stale.
+
+        With ``allow_stale`` an outdated list is served immediately while a
+        background refresh brings it up to date.
+        """
+        if top_n > self.size:
+            return [_row_dict(row) for row in recommend(top_n, self.cfg)]
+        key = self._current_key()
+        with self._lock:
+            if self._key == key:
+                return self._rows[:top_n]
+        if self._load_snapshot(key):
+            return self._rows[:top_n]
+        if allow_stale and self._key is not None and self._key[1:] == key[1:]:
+            self.refresh_async()
+            return self._rows[:top_n]
+        self.refresh()
+        return self._rows[:top_n]
+
+    def _current_key(self) -> tuple:
+        """Return ``(data version, backend key, half-life)`` the list depends on."""
+        cfg = self.cfg if self.cfg is not None else load_config()
+        return (
+            db.data_version(),
+            get_backend(cfg).key,
+            cfg.preference_half_life_days,
+        )
+
+    def refresh(self) -> None:
+        """Recompute the ranked list for the current data version."""
+        key = self._current_key()
+        rows = [_row_dict(row) for row in recommend(self.size, self.cfg)]
+        with self._lock:
+            self._key = key
+            self._rows = rows
+        if self.snapshot is not None:
+            self._write_snapshot(key, rows)
+
+    def refresh_async(self) -> threading.Thread:
+        """Refresh in a background thread, coalescing concurrent requests."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._pending = True
+                return self._thread
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def _refresh_loop(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:  # noqa: BLE001
+                logger.error("[x] background refresh failed: %s", e)
+            with self._lock:
+                if not self._pending:
+                    return
+                self._pending = False
+
+    def _load_snapshot(self, key: tuple) -> bool:
+        if self.snapshot is None or not self.snapshot.is_file():
+            return False
+        try:
+            data = json.loads(self.snapshot.read_text())
+        except (OSError, ValueError):
+            return False
+        stored = (data.get("version"), data.get("model"), data.get("half_life"))
+        if stored != key or data.get("size", 0) < self.size:
+            return False
+        with self._lock:
+            self._key = key
+            self._rows = data["rows"]
+        logger.debug("loaded recommendation snapshot v%d", key[0])
+        return True
+
+    def _write_snapshot(self, key: tuple, rows: List[dict]) -> None:
+        version, model, half_life = key
+        tmp = self.snapshot.with_name(self.snapshot.name + ".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "version": version,
+                    "model": model,
+                    "half_life": half_life,
+                    "size": self.size,
+                    "rows": rows,
+                }
+            )
+        )
+        os.replace(tmp, self.snapshot)
+
+
+def _row_dict(row) -> dict:
+    return {key: row[key] for key in ("id", "title", "description", "url")}
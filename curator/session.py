@@ -0,0 +1,77 @@
+"""Shared keep-alive HTTP sessions for archive.org traffic.
+
+One :class:`requests.Session` per pool configuration is reused by every
+search, metadata and download call, so worker threads draw from a pool of
+persistent connections instead of paying a TCP and TLS handshake per
+request. Connection errors and 5xx replies are retried at the transport
+level; 429/503 are left to :mod:`curator.ratelimit`, which slows the bucket.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, Tuple
+
+import requests
+
+from . import USER_AGENT
+from .config import Config
+
+
+# Hosts kept in the pool: archive.org plus the mirrors downloads redirect to
+POOL_HOSTS = 8
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (500, 502, 504)
+
+_SESSIONS: Dict[Tuple[int, int], requests.Session] = {}
+_LOCK = threading.Lock()
+
+
+def pool_size(cfg: Config) -> int:
+    """Return connections kept per host: one per worker plus the search."""
+    return cfg.http_pool_size or max(1, cfg.fetch_workers, cfg.download_workers) + 1
+
+
+def get_session(cfg: Config) -> requests.Session:
+    """Return the shared session for ``cfg``'s pool size and retry policy."""
+    key = (pool_size(cfg), cfg.http_retries)
+    with _LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = _SESSIONS[key] = _build_session(*key)
+        return session
+
+
+def _build_session(pool: int, retries: int) -> requests.Session:
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    # pool_block keeps extra threads waiting for a warm connection rather
+    # than opening (and discarding) throwaway ones
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=pool,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def close_sessions() -> None:
+    """Close every pooled connection."""
+    with _LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+    for session in sessions:
+        session.close()
@@ -1,18 +1,48 @@
 from __future__ import annotations
 
-from flask import Flask, render_template
+from typing import Optional
+
+from flask import Flask, render_template, request
 from flask_cors import CORS
+from markupsafe import Markup, escape
 import logging
 
-from . import db
+from . import checkpoint, db
+from .config import Config, load_config
 
 
 logger = logging.getLogger(__name__)
 
+SEARCH_PAGE_SIZE = 20
+
+
+def _highlight(snippet: str) -> Markup:
+    """Escape a search snippet and wrap its hits in ``<mark>``."""
+    return Markup(
+        str(escape(snippet or ""))
+        .replace(db.SNIPPET_OPEN, "<mark>")
+        .replace(db.SNIPPET_CLOSE, "</mark>")
+    )
+
 
-def create_app() -> Flask:
+def create_app(cfg: Optional[Config] = None, warm: bool = False) -> Flask:
+    from .recommend import RecommendationCache, snapshot_path
+
+    if cfg is None:
+        cfg = load_config()
     app = Flask(__name__, static_folder="static", template_folder="templates")
     CORS(app)
+    app.add_template_filter(_highlight, "highlight")
+    db.configure(cfg.db_profile)
+    checkpointer = checkpoint.from_config(cfg)
+    if checkpointer is not None:
+        app.extensions["checkpointer"] = checkpointer.start()
+    recommendations = RecommendationCache(
+        cfg.recommend_cache_size, cfg, snapshot=snapshot_path()
+    )
+    app.extensions["recommendations"] = recommendations
+    if warm:
+        recommendations.refresh_async()
     logger.info("[i] web app created")
 
     @app.get("/")
@@ -21,6 +51,32 @@ def create_app() -> Flask:
         logger.debug("serving index with %d items", len(items))
         return render_template("index.html", items=items)
 
+    @app.get("/recommend")
+    def recommend():
+        n = request.args.get("n", default=20, type=int)
+        items = recommendations.get(n, allow_stale=True)
+        logger.debug("serving %d recommendations", len(items))
+        return render_template("index.html", items=items, heading="Recommended")
+
+    @app.get("/search")
+    def search():
+        q = request.args.get("q", default="", type=str).strip()
+        page = max(1, request.args.get("page", default=1, type=int))
+        # One extra row tells whether there is a next page
+        rows = db.search_items(
+            q, limit=SEARCH_PAGE_SIZE + 1, offset=(page - 1) * SEARCH_PAGE_SIZE
+        )
+        logger.debug("search %r page %d: %d rows", q, page, len(rows))
+        return render_template(
+            "search.html",
+            q=q,
+            page=page,
+            results=rows[:SEARCH_PAGE_SIZE],
+            has_next=len(rows) > SEARCH_PAGE_SIZE,
+            truncated=db.search_truncated(q),
+            candidates=db.SEARCH_CANDIDATES,
+        )
+
     @app.post("/rate/<item_id>/<int:score>")
     def rate(item_id: str, score: int):
         try:
@@ -29,6 +85,7 @@ def create_app() -> Flask:
             logger.warning("[!] %s", e)
             return str(e), 400
         logger.info("[i] rated %s %d via web", item_id, score)
+        recommendations.refresh_async()
         return render_template("rated_fragment.html", score=score)
 
     return app
@@ -36,7 +93,7 @@ def create_app() -> Flask:
 
 def main() -> None:
     logger.info("[i] running web UI on :5000")
-    create_app().run(host="0.0.0.0", port=5000)
+    create_app(warm=True).run(host="0.0.0.0", port=5000)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+import os
+import time
+
+from curator import db
+from curator.checkpoint import Checkpointer, from_config
+from curator.config import Config
+
+
+def test_checkpointer_truncates_wal(tmp_path):
+    db_path = tmp_path / "wal.db"
+    db.init_db(db_path)
+    db.insert_items(
+        [(f"id{i}", "title", "x" * 500, 60, "u") for i in range(500)],
+        db_path=db_path,
+    )
+    wal = f"{db_path}-wal"
+    assert os.path.getsize(wal) > 0
+
+    checkpointer = Checkpointer(db_path, interval=60, truncate_bytes=1 << 30)
+    result = checkpointer.run_once()
+    assert result["busy"] == 0
+    assert result["log"] == result["checkpointed"]
+    # Below the threshold the WAL is only copied back, not shrunk
+    assert os.path.getsize(wal) > 0
+
+    checkpointer.truncate_bytes = 0
+    checkpointer.run_once()
+    assert os.path.getsize(wal) == 0
+    assert checkpointer.truncations == 1
+    assert db.count_items(db_path) == 500
+    db.close_connections()
+
+
+def test_checkpointer_thread_and_config(tmp_path):
+    db_path = tmp_path / "thread.db"
+    db.init_db(db_path)
+    assert from_config(Config(checkpoint_interval_s=0)) is None
+
+    checkpointer = from_config(Config(checkpoint_interval_s=0.01), db_path)
+    with checkpointer:
+        db.insert_item("a", "t", "d", 1, "u", db_path=db_path)
+        deadline = time.monotonic() + 5
+        while checkpointer.runs == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert checkpointer.runs > 0
+    assert checkpointer._thread is None
+    db.close_connections()
@@ -1,3 +1,8 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
 from click.testing import CliRunner
 from curator import db
 
@@ -52,3 +57,74 @@ def test_cli_invalid_rating(monkeypatch, tmp_path):
     result = runner.invoke(cli, ["rate", "vid1", "11"])
     assert result.exit_code != 0
     assert "between 1 and 10" in result.output
+
+
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from click.testing import CliRunner
+from curator.cli import cli
+result = CliRunner().invoke(cli, ["list", "-n", "1"])
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("numpy", "sentence_transformers", "torch", "requests", "flask")
+         if m in sys.modules]
+print(result.exit_code, elapsed, ",".join(heavy))
+"""
+
+
+def test_cli_list_cold_start(tmp_path):
+    """``curator list`` must not import heavy modules or load the model."""
+    env = dict(os.environ, CURATOR_DB_PATH=str(tmp_path / "start.db"))
+    root = Path(__file__).resolve().parents[1]
+
+    # First run creates the schema, the second measures a warm database
+    for _ in range(2):
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=root,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+
+    exit_code, elapsed = out[0], float(out[1])
+    heavy = out[2] if len(out) > 2 else ""
+    assert exit_code == "0"
+    assert heavy == ""
+    assert elapsed < 0.2
+
+
+def test_cli_db_migrate_dry_run(monkeypatch, tmp_path):
+    db_path = tmp_path / "migrate.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    from curator.cli import cli
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["db", "migrate", "--dry-run"])
+    assert result.exit_code == 0
+    assert f"Pending {db.SCHEMA_VERSION}:" in result.output
+    assert db.schema_version(db_path) == 0
+
+    result = runner.invoke(cli, ["db", "migrate"])
+    assert result.exit_code == 0
+    assert f"Migrated from version 0 to {db.SCHEMA_VERSION}" in result.output
+
+    result = runner.invoke(cli, ["db", "migrate", "--dry-run"])
+    assert "Schema is current" in result.output
+
+
+def test_cli_search(monkeypatch, tmp_path):
+    setup_db(tmp_path, monkeypatch)
+    from curator.cli import cli
+
+    result = CliRunner().invoke(cli, ["search", "tit"])
+    assert result.exit_code == 0
+    assert "vid1 - title" in result.output
+    result = CliRunner().invoke(cli, ["search", "nothing"])
+    assert "No matches" in result.output
+
+    db.insert_item("vid9", "title two", "d", 1, "u", db_path=db.DB_PATH)
+    monkeypatch.setattr(db, "SEARCH_CANDIDATES", 1)
+    result = CliRunner().invoke(cli, ["search", "title"])
+    assert "Too many matches" in result.output
@@ -19,6 +19,14 @@ class FakeResponse:
     def iter_content(self, chunk_size=8192):
         yield self._content
 
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, get):
+        self.get = get
+
 
 def setup_fetch_db(tmp_path, monkeypatch):
     db_path = tmp_path / "cli.db"
@@ -31,8 +39,8 @@ def setup_fetch_db(tmp_path, monkeypatch):
     orig_get_conn = db.get_connection
 
     monkeypatch.setattr(db, "init_db", lambda path=db_path: orig_init(path))
-    monkeypatch.setattr(db, "insert_item", lambda *a, **kw: orig_insert(*a, db_path=db_path))
-    monkeypatch.setattr(db, "record_download", lambda *a, **kw: orig_record_dl(*a, db_path=db_path))
+    monkeypatch.setattr(db, "insert_item", lambda *a, **kw: orig_insert(*a, **kw, db_path=db_path))
+    monkeypatch.setattr(db, "record_download", lambda *a, **kw: orig_record_dl(*a, **kw, db_path=db_path))
     monkeypatch.setattr(db, "get_connection", lambda db_path=db_path: orig_get_conn(db_path))
 
     return db_path, orig_get_conn
@@ -46,7 +54,7 @@ def test_cli_fetch(monkeypatch, tmp_path):
 
     # ensure fetch module uses patched connection
     monkeypatch.setattr(fetch.db, "get_connection", lambda db_path=db_path: orig_get_conn(db_path))
-    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda x: None)
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
 
     def fake_get(url, params=None, stream=False, timeout=None, headers=None):
         if "advancedsearch" in url:
@@ -69,7 +77,7 @@ def test_cli_fetch(monkeypatch, tmp_path):
             return FakeResponse(content=b"abc")
         raise RuntimeError("unexpected url" + url)
 
-    monkeypatch.setattr(fetch.requests, "get", fake_get)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
 
     monkeypatch.setattr(cli, "load_config", lambda: Config(daily_candidates=1, seed_keywords=["x"], rps_limit=0))
 
@@ -82,5 +90,5 @@ def test_cli_fetch(monkeypatch, tmp_path):
 
     items = db.list_items(db_path=db_path)
     assert items and items[0]["id"] == "id1"
-    assert (download_dir / "video.mp4").exists()
+    assert (download_dir / "id1" / "video.mp4").exists()
 
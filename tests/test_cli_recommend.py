@@ -21,11 +21,11 @@ class DummyModel:
     def __init__(self, vectors):
         self.vectors = vectors
 
-    def encode(self, text, convert_to_numpy=True, normalize_embeddings=True):
-        vec = np.array(self.vectors[text], dtype=float)
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        vecs = np.array([self.vectors[t] for t in texts], dtype=float)
         if normalize_embeddings:
-            vec = vec / np.linalg.norm(vec)
-        return vec
+            vecs = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs
 
     def get_sentence_embedding_dimension(self):
         return 2
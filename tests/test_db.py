@@ -1,3 +1,5 @@
+import pytest
+
 from curator import db
 
 
@@ -30,3 +32,411 @@ def test_db_path_env_var(monkeypatch, tmp_path):
     assert path.exists()
     items = db_module.list_items()
     assert items and items[0]["id"] == "env1"
+
+
+def test_insert_item_invalidates_changed_embedding(monkeypatch, tmp_path):
+    db_path = tmp_path / "emb.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    db.insert_item("vid1", "title", "desc", 10, "url", db_path=db_path)
+    db.insert_item("vid2", "title2", "desc2", 10, "url2", db_path=db_path)
+    db.store_embeddings(
+        [("vid1", b"\x00" * 8), ("vid2", b"\x00" * 8)],
+        "model",
+        db_path=db_path,
+    )
+
+    # Same text keeps the vector, new text drops it
+    db.insert_item("vid1", "title", "desc", 20, "url", db_path=db_path)
+    db.insert_item("vid2", "title2", "new desc", 10, "url2", db_path=db_path)
+
+    rows = db.get_embeddings("model", db_path=db_path)
+    assert [row["item_id"] for row in rows] == ["vid1"]
+
+
+def test_insert_items_upserts_in_place(monkeypatch, tmp_path):
+    db_path = tmp_path / "bulk.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    db.insert_items(
+        [
+            ("vid1", "title", "desc", 10, "url", "2020-01-01 00:00:00", 100),
+            {"id": "vid2", "title": "title2", "description": "desc2",
+             "duration": 5, "url": "url2"},
+        ],
+        db_path=db_path,
+    )
+    db.record_rating("vid1", 8, db_path=db_path)
+    db.store_embeddings(
+        [("vid1", b"\x00" * 8), ("vid2", b"\x00" * 8)],
+        "model",
+        db_path=db_path,
+    )
+
+    count = db.insert_items(
+        [
+            ("vid1", "title", "desc", 20, "url-new"),
+            ("vid2", "title2", "changed", 5, "url2", None, 50),
+            ("vid3", "title3", "desc3", 1, "url3"),
+        ],
+        db_path=db_path,
+    )
+    assert count == 3
+
+    with db.get_connection(db_path) as conn:
+        rows = {
+            r["id"]: r
+            for r in conn.execute("SELECT id, duration, url, added_at, size_bytes FROM items")
+        }
+    # added_at and a known size survive, other columns are updated
+    assert rows["vid1"]["added_at"] == "2020-01-01 00:00:00"
+    assert rows["vid1"]["size_bytes"] == 100
+    assert rows["vid1"]["duration"] == 20
+    assert rows["vid1"]["url"] == "url-new"
+    assert rows["vid2"]["size_bytes"] == 50
+    assert rows["vid3"]["added_at"]
+    assert db.list_ratings("vid1", db_path=db_path)[0]["rating"] == 8
+    emb = db.get_embeddings("model", db_path=db_path)
+    assert [row["item_id"] for row in emb] == ["vid1"]
+
+
+def test_init_db_skips_when_schema_current(monkeypatch, tmp_path):
+    db_path = tmp_path / "version.db"
+    db.init_db(db_path)
+    with db.get_connection(db_path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+        # Dropping a table shows whether the script runs again
+        conn.execute("DROP TABLE meta")
+
+    db.init_db(db_path)
+    with db.get_connection(db_path) as conn:
+        tables = {
+            row[0]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        }
+    assert "meta" not in tables
+
+
+def test_embeddings_content_hash_dropped(tmp_path):
+    db_path = tmp_path / "hash.db"
+    db.init_db(db_path)
+    with db.get_connection(db_path) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+    assert columns == {"item_id", "model", "vector"}
+    db.close_connections()
+
+
+def test_init_db_adds_download_status(tmp_path):
+    """Databases created before the status column are upgraded in place."""
+    db_path = tmp_path / "old.db"
+    with db.get_connection(db_path) as conn:
+        conn.execute("CREATE TABLE downloads (item_id TEXT, size_bytes INTEGER, downloaded_at TIMESTAMP)")
+        conn.execute("INSERT INTO downloads VALUES ('a', 1, CURRENT_TIMESTAMP)")
+        conn.execute("PRAGMA user_version = 1")
+
+    db.init_db(db_path)
+
+    assert db.get_download_status("a", db_path=db_path) == "complete"
+
+
+def test_connections_are_reused_per_thread(tmp_path):
+    import threading
+
+    db_path = tmp_path / "pool.db"
+    db.init_db(db_path)
+    with db.get_connection(db_path) as first:
+        # Nested calls share the outer connection
+        with db.get_connection(db_path) as inner:
+            assert inner is first
+        seen = []
+        thread = threading.Thread(
+            target=lambda: seen.append(db.data_version(db_path=db_path))
+        )
+        thread.start()
+        thread.join()
+        assert seen
+    with db.get_connection(db_path) as again:
+        assert again is first
+    db.close_connections()
+
+
+def test_transaction_rolls_back_nested_writes(tmp_path):
+    db_path = tmp_path / "txn.db"
+    db.init_db(db_path)
+    with pytest.raises(RuntimeError):
+        with db.transaction(db_path) as conn:
+            conn.execute("INSERT INTO items (id) VALUES ('a')")
+            db.insert_item("b", "t", "d", 1, "u", db_path=db_path)
+            raise RuntimeError("boom")
+    assert db.count_items(db_path) == 0
+    db.close_connections()
+
+
+def test_configure_applies_pragma_profile(tmp_path):
+    db_path = tmp_path / "profile.db"
+    db.init_db(db_path)
+    try:
+        with db.get_connection(db_path) as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+        db.configure("safe")
+        with db.get_connection(db_path) as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+            assert conn.execute("PRAGMA mmap_size").fetchone()[0] == 0
+        with pytest.raises(ValueError):
+            db.configure("fastest")
+    finally:
+        db.configure(db.DEFAULT_PROFILE)
+        db.close_connections()
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    import re
+
+    db_path = tmp_path / "plan.db"
+    db.init_db(db_path)
+    with db.get_connection(db_path) as conn:
+        tables = {
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        for sql in db.HOT_QUERIES:
+            params = {name: None for name in re.findall(r":(\w+)", sql)}
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            # Scanning a bounded subquery is fine, and FTS5 reports its MATCH
+            # lookups (":M" index plans) as virtual table scans
+            scans = [
+                step for step in plan
+                if re.match(r"SCAN (\w+)", step)
+                and re.match(r"SCAN (\w+)", step).group(1) in tables
+                and not re.search(r"VIRTUAL TABLE INDEX \d+:\S*M", step)
+            ]
+            assert plan and not scans, (sql, plan)
+    db.close_connections()
+
+
+def test_list_items_today_uses_utc_day(tmp_path):
+    from datetime import datetime, timedelta, timezone
+
+    db_path = tmp_path / "today.db"
+    db.init_db(db_path)
+    now = datetime.now(timezone.utc)
+    start, end = db.utc_day_bounds()
+    yesterday = (now - timedelta(days=1)).strftime(db.TIMESTAMP_FORMAT)
+    db.insert_item("old", "t", "d", 1, "u", added_at=yesterday, db_path=db_path)
+    db.insert_item("first", "t", "d", 1, "u", added_at=start, db_path=db_path)
+    db.insert_item("next", "t", "d", 1, "u", added_at=end, db_path=db_path)
+    db.insert_item("now", "t", "d", 1, "u", db_path=db_path)
+    ids = [row["id"] for row in db.list_items_today(db_path=db_path)]
+    assert ids == ["now", "first"]
+    db.close_connections()
+
+
+def _title_length_migration():
+    def schema(conn):
+        db._ensure_column(conn, "items", "title_len", "INTEGER")
+
+    return db.Migration(
+        db.SCHEMA_VERSION + 1,
+        "title lengths",
+        schema,
+        db.Backfill(
+            estimate="SELECT COUNT(*) FROM items",
+            step="""
+                UPDATE items SET title_len = length(title) WHERE rowid IN (
+                    SELECT rowid FROM items WHERE title_len IS NULL LIMIT :batch
+                )
+            """,
+        ),
+    )
+
+
+def test_migrate_backfills_in_batches(monkeypatch, tmp_path):
+    db_path = tmp_path / "migrate.db"
+    db.init_db(db_path)
+    db.insert_items([(f"id{i}", "x" * i, "", 1, "u") for i in range(5)], db_path=db_path)
+
+    migration = _title_length_migration()
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS + [migration])
+    monkeypatch.setattr(db, "SCHEMA_VERSION", migration.version)
+
+    plan = db.migrate(db_path, dry_run=True)
+    assert [(m.version, rows) for m, rows in plan] == [(migration.version, 5)]
+    assert db.schema_version(db_path) == migration.version - 1
+
+    steps = []
+    orig_transaction = db.transaction
+    monkeypatch.setattr(
+        db, "transaction", lambda p=None: steps.append(p) or orig_transaction(p)
+    )
+    db.migrate(db_path, batch_size=2)
+    assert len(steps) == 3
+    assert db.schema_version(db_path) == migration.version
+    with db.get_connection(db_path) as conn:
+        lengths = [row[0] for row in conn.execute("SELECT title_len FROM items ORDER BY id")]
+    assert lengths == [0, 1, 2, 3, 4]
+    assert db.migrate(db_path) == []
+    db.close_connections()
+
+
+def test_rating_stats_follow_ratings(tmp_path):
+    db_path = tmp_path / "stats.db"
+    db.init_db(db_path)
+    db.insert_items([("a", "t", "d", 1, "u"), ("b", "t", "d", 1, "u")], db_path=db_path)
+    db.record_rating("a", 4, "2024-01-01 00:00:00", db_path=db_path)
+    db.record_rating("a", 8, "2024-01-03 00:00:00", db_path=db_path)
+    db.record_rating("b", 5, db_path=db_path)
+
+    stats = db.get_rating_stats(["a", "b", "c"], db_path=db_path)
+    assert set(stats) == {"a", "b"}
+    assert (stats["a"]["count"], stats["a"]["total"], stats["a"]["mean"]) == (2, 12, 6.0)
+    assert stats["a"]["last_rated_at"] == "2024-01-03 00:00:00"
+
+    with db.get_connection(db_path) as conn:
+        conn.execute("UPDATE ratings SET item_id = 'b' WHERE rating = 8")
+        conn.execute("DELETE FROM ratings WHERE rating = 5")
+    stats = db.get_rating_stats(["a", "b"], db_path=db_path)
+    assert (stats["a"]["count"], stats["a"]["mean"]) == (1, 4.0)
+    assert (stats["b"]["count"], stats["b"]["mean"]) == (1, 8.0)
+    db.close_connections()
+
+
+def test_rating_stats_backfilled_on_upgrade(monkeypatch, tmp_path):
+    db_path = tmp_path / "stats_upgrade.db"
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS[:1])
+    db.migrate(db_path)
+    db.insert_items([(f"id{i}", "t", "d", 1, "u") for i in range(3)], db_path=db_path)
+    with db.get_connection(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO ratings (item_id, rating) VALUES (?, ?)",
+            [("id0", 2), ("id0", 4), ("id1", 7), ("id2", 9)],
+        )
+    monkeypatch.undo()
+
+    plan = db.migrate(db_path, dry_run=True)
+    assert (plan[0][0].version, plan[0][1]) == (6, 3)
+    # Run only the schema step, then rate before the backfill reaches id2
+    with db.get_connection(db_path) as conn:
+        plan[0][0].schema(conn)
+    db.record_rating("id2", 3, db_path=db_path)
+    db.migrate(db_path, batch_size=1)
+
+    stats = db.get_rating_stats(["id0", "id1", "id2"], db_path=db_path)
+    assert {k: (r["count"], r["mean"]) for k, r in stats.items()} == {
+        "id0": (2, 3.0), "id1": (1, 7.0), "id2": (2, 6.0)
+    }
+    db.close_connections()
+
+
+def test_search_items_ranks_and_stays_in_sync(tmp_path):
+    db_path = tmp_path / "search.db"
+    db.init_db(db_path)
+    db.insert_items(
+        [
+            ("desc", "Cartoons", "an old rocket launch", 1, "u1"),
+            ("title", "Rocket launch", "newsreel", 1, "u2"),
+            ("other", "Cooking", "soup", 1, "u3"),
+        ],
+        db_path=db_path,
+    )
+    ids = [row["id"] for row in db.search_items("rocket", db_path=db_path)]
+    assert ids == ["title", "desc"]
+    # The last word matches as a prefix; FTS syntax in input is inert
+    assert [r["id"] for r in db.search_items('laun "AND', db_path=db_path)] == []
+    assert [r["id"] for r in db.search_items("rock", db_path=db_path)] == ["title", "desc"]
+    row = db.search_items("newsreel", db_path=db_path)[0]
+    assert row["snippet"] == f"{db.SNIPPET_OPEN}newsreel{db.SNIPPET_CLOSE}"
+    assert db.search_items("  ", db_path=db_path) == []
+
+    db.insert_item("other", "Cooking", "rocket soup", 1, "u3", db_path=db_path)
+    with db.get_connection(db_path) as conn:
+        conn.execute("DELETE FROM items WHERE id = 'desc'")
+    ids = [row["id"] for row in db.search_items("rocket", db_path=db_path)]
+    assert ids == ["title", "other"]
+    assert [r["id"] for r in db.search_items("rocket", limit=1, offset=1, db_path=db_path)] == ["other"]
+    db.close_connections()
+
+
+def test_search_index_backfilled_on_upgrade(monkeypatch, tmp_path):
+    db_path = tmp_path / "search_upgrade.db"
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS[:2])
+    db.migrate(db_path)
+    db.insert_items([(f"id{i}", f"film {i}", "", 1, "u") for i in range(5)], db_path=db_path)
+    monkeypatch.undo()
+
+    db.migrate(db_path, batch_size=2)
+    assert len(db.search_items("film", db_path=db_path)) == 5
+    db.close_connections()
+
+
+def test_concurrent_ratings_keep_preference_exact(monkeypatch, tmp_path):
+    import struct
+    import threading
+
+    db_path = tmp_path / "race.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+    db.insert_item("a", "t", "d", 1, "u", db_path=db_path)
+    vector = struct.pack("2f", 1.0, 0.0)
+    db.store_embeddings([("a", vector)], "m", db_path=db_path)
+    db.store_preference("m", struct.pack("2f", 0.0, 0.0), 0.0, 0.0, None, db_path=db_path)
+
+    def rate(seed):
+        for i in range(50):
+            db.record_rating("a", (seed + i) % 10 + 1, db_path=db_path)
+
+    threads = [threading.Thread(target=rate, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    mean = db.get_rating_stats(["a"], db_path=db_path)["a"]["mean"]
+    pref = db.get_preference("m", db_path=db_path)
+    # Each rating shifts the sum by (new mean - old mean), so it telescopes
+    assert abs(pref["weight"] - mean) < 1e-9
+    assert abs(struct.unpack("2f", pref["vector"])[0] - mean) < 1e-4
+    db.close_connections()
+
+
+def test_embedding_queue_follows_items_and_vectors(tmp_path):
+    db_path = tmp_path / "queue.db"
+    db.init_db(db_path)
+
+    def state():
+        with db.get_connection(db_path) as conn:
+            pending = {r[0] for r in conn.execute("SELECT item_id FROM embedding_pending")}
+            counts = dict(conn.execute("SELECT model, count FROM embedding_counts"))
+        return pending, counts
+
+    db.insert_items([("a", "t", "d", 1, "u"), ("b", "t", "d", 1, "u")], db_path=db_path)
+    assert state() == ({"a", "b"}, {})
+    db.store_embeddings([("a", b"1"), ("b", b"2")], "m", db_path=db_path)
+    assert state() == (set(), {"m": 2})
+    db.store_embeddings([("a", b"3")], "m", db_path=db_path)
+    assert state() == (set(), {"m": 2})
+
+    db.insert_item("a", "new title", "d", 1, "u", db_path=db_path)
+    assert state() == ({"a"}, {"m": 1})
+    db.store_embeddings([("a", b"4")], "n", db_path=db_path)
+    assert state() == (set(), {"m": 1, "n": 1})
+    db.store_embeddings([("b", b"5")], "n", db_path=db_path)
+    assert state() == (set(), {"m": 0, "n": 2})
+    db.drop_embeddings_except("m", db_path=db_path)
+    assert state() == ({"a", "b"}, {"m": 0, "n": 0})
+
+    # Upgrading a version 8 database queues items that have no vector
+    db.store_embeddings([("a", b"6")], "m", db_path=db_path)
+    with db.get_connection(db_path) as conn:
+        conn.executescript(
+            "DROP TABLE embedding_pending; DROP TABLE embedding_counts; PRAGMA user_version = 8"
+        )
+        for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_pending'"
+        ).fetchall():
+            conn.execute(f"DROP TRIGGER {name}")
+    db.migrate(db_path, batch_size=1)
+    assert state() == ({"b"}, {"m": 1})
+    db.close_connections()
@@ -20,6 +20,14 @@ class FakeResponse:
     def iter_content(self, chunk_size=8192):
         yield self._content
 
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, get):
+        self.get = get
+
 
 def test_fetch_candidates(monkeypatch, tmp_path):
     db_path = tmp_path / "fetch.db"
@@ -28,7 +36,7 @@ def test_fetch_candidates(monkeypatch, tmp_path):
 
     orig_insert = db.insert_item
     monkeypatch.setattr(
-        db, "insert_item", lambda *args, **kwargs: orig_insert(*args, db_path=db_path)
+        db, "insert_item", lambda *args, **kwargs: orig_insert(*args, **kwargs, db_path=db_path)
     )
 
     from curator import fetch
@@ -55,8 +63,8 @@ def test_fetch_candidates(monkeypatch, tmp_path):
         else:
             raise RuntimeError("unexpected url" + url)
 
-    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda x: None)
-    monkeypatch.setattr(fetch.requests, "get", fake_get)
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
 
     cfg = Config(daily_candidates=1, seed_keywords=["x"], rps_limit=0)
     ids = fetch.fetch_candidates(cfg)
@@ -74,8 +82,8 @@ def test_user_agent_header(monkeypatch):
         calls.append(headers)
         return FakeResponse({"response": {"docs": []}})
 
-    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda x: None)
-    monkeypatch.setattr(fetch.requests, "get", fake_get)
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
 
     cfg = Config(daily_candidates=1, seed_keywords=["x"], rps_limit=0)
     fetch.fetch_candidates(cfg)
@@ -90,13 +98,13 @@ def test_timeout_passed(monkeypatch, tmp_path):
 
     orig_insert = db.insert_item
     monkeypatch.setattr(
-        db, "insert_item", lambda *args, **kwargs: orig_insert(*args, db_path=db_path)
+        db, "insert_item", lambda *args, **kwargs: orig_insert(*args, **kwargs, db_path=db_path)
     )
     orig_record_dl = db.record_download
     monkeypatch.setattr(
         db,
         "record_download",
-        lambda *args, **kwargs: orig_record_dl(*args, db_path=db_path),
+        lambda *args, **kwargs: orig_record_dl(*args, **kwargs, db_path=db_path),
     )
     orig_get_conn = db.get_connection
     monkeypatch.setattr(
@@ -136,8 +144,8 @@ def test_timeout_passed(monkeypatch, tmp_path):
         else:
             raise RuntimeError("unexpected url" + url)
 
-    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda x: None)
-    monkeypatch.setattr(fetch.requests, "get", fake_get)
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
 
     cfg = Config(daily_candidates=1, seed_keywords=["x"], rps_limit=0, timeout=9)
     ids = fetch.fetch_candidates(cfg)
@@ -154,7 +162,7 @@ def test_partial_download_cleanup(monkeypatch, tmp_path):
     monkeypatch.setattr(
         db,
         "record_download",
-        lambda *args, **kwargs: orig_record_dl(*args, db_path=db_path),
+        lambda *args, **kwargs: orig_record_dl(*args, **kwargs, db_path=db_path),
     )
     orig_get_conn = db.get_connection
     monkeypatch.setattr(
@@ -166,7 +174,7 @@ def test_partial_download_cleanup(monkeypatch, tmp_path):
     monkeypatch.setattr(
         fetch.db, "get_connection", lambda db_path=db_path: orig_get_conn(db_path)
     )
-    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda x: None)
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
 
     db.insert_item(
         "vid2",
@@ -195,13 +203,13 @@ def test_partial_download_cleanup(monkeypatch, tmp_path):
     def fake_get(url, stream=False, timeout=None, headers=None):
         return StreamResp([b"a" * 150, b"b" * 100])
 
-    monkeypatch.setattr(fetch.requests, "get", fake_get)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
 
     cfg = Config(download_cap_gb=0.0000002, seed_keywords=[], rps_limit=0)
     with pytest.raises(RuntimeError):
         fetch.download_item("vid2", tmp_path, cfg)
 
-    assert not (tmp_path / "file.bin").exists()
+    assert not (tmp_path / "vid2" / "file.bin").exists()
 
 
 def test_best_h264_file():
@@ -262,3 +270,549 @@ def test_daily_downloaded_bytes(monkeypatch, tmp_path):
     db.record_download("t2", 300, downloaded_at=f"{today} 23:59:59")
 
     assert fetch._daily_downloaded_bytes() == 400
+
+
+def test_fetch_candidates_concurrent_and_ordered(monkeypatch, tmp_path):
+    """Metadata lookups overlap while inserts keep search order."""
+    import threading
+    import time
+
+    db_path = tmp_path / "concurrent.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    docs = [{"identifier": f"id{i}", "title": f"T{i}", "duration": 10} for i in range(6)]
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_get(url, params=None, stream=False, timeout=None, headers=None):
+        if "advancedsearch" in url:
+            return FakeResponse({"response": {"docs": docs}})
+        with lock:
+            active.append(url)
+            peak.append(len(active))
+        # Later identifiers answer first
+        time.sleep(0.05 * (6 - int(url.rsplit("id", 1)[1])))
+        with lock:
+            active.remove(url)
+        return FakeResponse({"files": [{"name": "v.mp4", "format": "h.264", "size": "1"}]})
+
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    cfg = Config(daily_candidates=6, seed_keywords=["x"], rps_limit=0, fetch_workers=6)
+    ids = fetch.fetch_candidates(cfg)
+
+    assert ids == [f"id{i}" for i in range(6)]
+    assert max(peak) > 1
+
+
+def test_session_pool_shared_and_sized():
+    """One keep-alive session per pool size, sized to fetch concurrency."""
+    from curator import session
+
+    cfg = Config(fetch_workers=6, http_retries=2)
+    sess = session.get_session(cfg)
+
+    assert session.get_session(Config(fetch_workers=6, http_retries=2)) is sess
+    adapter = sess.get_adapter("https://archive.org/metadata/x")
+    assert adapter._pool_maxsize == 7
+    assert adapter.max_retries.total == 2
+    assert 429 not in adapter.max_retries.status_forcelist
+    assert sess.headers["User-Agent"] == USER_AGENT
+    session.close_sessions()
+
+
+def test_download_resumes_part_file(monkeypatch, tmp_path):
+    """A rerun sends Range from the .part size and charges only new bytes."""
+    db_path = tmp_path / "resume.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    db.insert_item("vid3", "t", "d", 10, "http://example.com/movie.mp4", db_path=db_path)
+    dst = tmp_path / "dl"
+    (dst / "vid3").mkdir(parents=True)
+    (dst / "vid3" / "movie.mp4.part").write_bytes(b"hello ")
+
+    class RangeResp(FakeResponse):
+        def __init__(self, content, status_code):
+            super().__init__(content=content, status_code=status_code)
+            self.headers = {"Content-Range": "bytes 6-10/11"}
+
+        def close(self):
+            pass
+
+    ranges = []
+
+    def fake_get(url, stream=False, timeout=None, headers=None):
+        ranges.append(headers.get("Range"))
+        return RangeResp(b"world", 206)
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    cfg = Config(seed_keywords=[], rps_limit=0)
+    path = fetch.download_item("vid3", dst, cfg)
+
+    assert ranges == ["bytes=6-"]
+    assert path.read_bytes() == b"hello world"
+    assert not (dst / "vid3" / "movie.mp4.part").exists()
+    assert fetch._daily_downloaded_bytes() == 5
+    assert db.get_download_status("vid3") == "complete"
+
+    # Already complete: no further request
+    assert fetch.download_item("vid3", dst, cfg) == path
+    assert len(ranges) == 1
+
+
+def test_download_cap_keeps_part(monkeypatch, tmp_path):
+    """Hitting the cap leaves a resumable .part and records a partial row."""
+    db_path = tmp_path / "partial.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    db.insert_item("vid4", "t", "d", 10, "http://example.com/clip.bin", db_path=db_path)
+
+    class StreamResp(FakeResponse):
+        def iter_content(self, chunk_size=8192):
+            yield b"a" * 150
+            yield b"b" * 100
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(
+        fetch, "get_session", lambda cfg: FakeSession(lambda url, **kw: StreamResp())
+    )
+
+    cfg = Config(download_cap_gb=0.0000002, seed_keywords=[], rps_limit=0)
+    with pytest.raises(RuntimeError):
+        fetch.download_item("vid4", tmp_path, cfg)
+
+    assert (tmp_path / "vid4" / "clip.bin.part").read_bytes() == b"a" * 150
+    assert not (tmp_path / "vid4" / "clip.bin").exists()
+    assert db.get_download_status("vid4") == "partial"
+    assert fetch._daily_downloaded_bytes() == 150
+
+
+def test_download_scheduler_never_exceeds_cap(monkeypatch, tmp_path):
+    """Parallel downloads reserve IA sizes up front and stay under the cap."""
+    import threading
+    import time
+
+    db_path = tmp_path / "sched.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    for i in range(4):
+        db.insert_item(
+            f"v{i}", "t", "d", 1, f"http://example.com/v{i}.bin", size_bytes=100,
+            db_path=db_path,
+        )
+
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    class SlowResp(FakeResponse):
+        def iter_content(self, chunk_size=8192):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            yield b"x" * 60
+            yield b"x" * 40
+            with lock:
+                active.pop()
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(
+        fetch, "get_session", lambda cfg: FakeSession(lambda url, **kw: SlowResp())
+    )
+
+    # Room for two and a half files
+    cfg = Config(download_cap_gb=250 / 1024**3, download_workers=4, rps_limit=0)
+    with fetch.DownloadScheduler(tmp_path / "dl", cfg) as scheduler:
+        results = list(scheduler.run([f"v{i}" for i in range(4)]))
+
+    done = [r for r in results if r[2] is None]
+    failed = [r for r in results if r[2] is not None]
+    assert len(done) == 2 and len(failed) == 2
+    assert all("cap" in str(err) for _, _, err in failed)
+    assert fetch._daily_downloaded_bytes() == 200
+    assert scheduler.budget.free == 50
+    assert max(peak) == 2
+
+
+def test_parallel_downloads_of_same_file_name(monkeypatch, tmp_path):
+    """Items whose IA files share a name get their own .part and final file."""
+    import time
+
+    db_path = tmp_path / "samename.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    for item_id in ("A", "B"):
+        db.insert_item(
+            item_id, "t", "d", 1, fetch._download_url(item_id, "movie.mp4"),
+            db_path=db_path,
+        )
+
+    class SlowResp(FakeResponse):
+        def iter_content(self, chunk_size=8192):
+            for _ in range(4):
+                time.sleep(0.02)
+                yield self._content[:2]
+
+    def fake_get(url, **kw):
+        return SlowResp(content=url.split("/")[-2].encode() * 2)
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    cfg = Config(download_workers=2, rps_limit=0)
+    with fetch.DownloadScheduler(tmp_path / "dl", cfg) as scheduler:
+        results = {r[0]: r for r in scheduler.run(["A", "B"])}
+
+    assert all(err is None for _, _, err in results.values())
+    assert results["A"][1].read_bytes() == b"AAAAAAAA"
+    assert results["B"][1].read_bytes() == b"BBBBBBBB"
+    # A completed download of one item is never returned for the other
+    assert fetch.download_item("B", tmp_path / "dl", cfg).read_bytes() == b"BBBBBBBB"
+
+
+def test_reservation_draws_beyond_estimate():
+    from curator import fetch
+
+    budget = fetch.CapBudget(100)
+    res = budget.reserve(10)
+    assert budget.free == 90
+    assert res.take(30)
+    assert budget.free == 70
+    assert not res.take(80)
+    res.release()
+    assert budget.free == 70
+    assert budget.reserve(200) is None
+
+
+def test_pipeline_downloads_while_metadata_resolves(monkeypatch, tmp_path):
+    """Downloads start before the slowest metadata lookup returns."""
+    import threading
+    import time
+
+    db_path = tmp_path / "pipe.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    docs = [{"identifier": f"id{i}", "title": f"T{i}", "duration": 10} for i in range(4)]
+    events = []
+    lock = threading.Lock()
+
+    def fake_get(url, params=None, stream=False, timeout=None, headers=None):
+        if "advancedsearch" in url:
+            return FakeResponse({"response": {"docs": docs}})
+        if "metadata" in url:
+            if url.endswith("id3"):
+                time.sleep(0.3)
+            ident = url.rsplit("/", 1)[1]
+            with lock:
+                events.append(("meta", ident))
+            return FakeResponse({"files": [{"name": "v.mp4", "format": "h.264", "size": "3"}]})
+        with lock:
+            events.append(("download", url.split("/")[-2]))
+        return FakeResponse(content=b"abc")
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    cfg = Config(
+        daily_candidates=4, seed_keywords=["x"], rps_limit=0,
+        fetch_workers=4, download_workers=2, pipeline_queue_size=1,
+    )
+    pipeline = fetch.FetchPipeline(tmp_path / "dl", cfg)
+    results = list(pipeline.run())
+
+    assert sorted(r[0] for r in results) == [f"id{i}" for i in range(4)]
+    assert all(err is None for _, _, err in results)
+    assert sorted(pipeline.fetched) == [f"id{i}" for i in range(4)]
+    assert events.index(("meta", "id3")) > events.index(next(e for e in events if e[0] == "download"))
+    assert {"search", "metadata", "download", "total"} <= set(pipeline.timings)
+
+
+def test_pipeline_reraises_search_failure(monkeypatch, tmp_path):
+    db_path = tmp_path / "pipefail.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(
+        fetch,
+        "get_session",
+        lambda cfg: FakeSession(lambda url, **kw: FakeResponse(status_code=500)),
+    )
+
+    with pytest.raises(RuntimeError):
+        list(fetch.FetchPipeline(tmp_path, Config(seed_keywords=["x"], rps_limit=0)).run())
+
+
+def test_known_ids_skip_metadata(monkeypatch, tmp_path):
+    """Known identifiers cost no /metadata call and keep their added_at."""
+    db_path = tmp_path / "known.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+    db.insert_item("old1", "t", "d", 1, "u", added_at="2020-01-01 00:00:00", db_path=db_path)
+
+    from curator import fetch
+
+    docs = [{"identifier": i, "title": i, "duration": 10} for i in ("old1", "new1", "new2", "new3")]
+    calls = []
+
+    def fake_get(url, params=None, stream=False, timeout=None, headers=None):
+        calls.append(url)
+        if "advancedsearch" in url:
+            assert params["rows"] == 6
+            return FakeResponse({"response": {"docs": docs}})
+        return FakeResponse({"files": [{"name": "v.mp4", "format": "h.264", "size": "1"}]})
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    before = fetch.prefilter_stats()["known"]
+    cfg = Config(daily_candidates=2, search_overfetch=3, seed_keywords=["x"], rps_limit=0)
+    ids = fetch.fetch_candidates(cfg)
+
+    assert ids == ["new1", "new2"]
+    assert not any(u.endswith("/old1") for u in calls)
+    assert not any(u.endswith("/new3") for u in calls)
+    assert fetch.prefilter_stats()["known"] - before == 1
+    row = [r for r in db.list_items(db_path=db_path) if r["id"] == "old1"][0]
+    assert row["added_at"] == "2020-01-01 00:00:00"
+
+    # Items inserted since are skipped on the next search
+    assert fetch._new_docs([{"identifier": "new1"}, {"identifier": "new3"}]) == [
+        {"identifier": "new3"}
+    ]
+
+
+def test_metadata_cache_and_revalidation(monkeypatch, tmp_path):
+    """Fresh entries skip the network; stale ones send validators and take 304s."""
+    db_path = tmp_path / "meta.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch, metacache
+
+    class MetaResp(FakeResponse):
+        def __init__(self, status_code=200):
+            super().__init__(
+                {"files": [{"name": "v.mp4", "format": "h.264", "size": "5"}]},
+                status_code=status_code,
+            )
+            self.headers = {"ETag": '"abc"'}
+
+    sent = []
+
+    def fake_get(url, params=None, stream=False, timeout=None, headers=None):
+        sent.append(headers)
+        return MetaResp(304 if "If-None-Match" in headers else 200)
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    cfg = Config(rps_limit=0, metadata_ttl_hours=1)
+    assert fetch._metadata("id1", cfg)["files"]
+    assert fetch._metadata("id1", cfg)["files"]
+    assert len(sent) == 1
+
+    # Expired: revalidated with the stored ETag
+    assert fetch._metadata("id1", Config(rps_limit=0, metadata_ttl_hours=0))["files"]
+    assert len(sent) == 2 and sent[1]["If-None-Match"] == '"abc"'
+
+    stats = metacache.get_cache(cfg).stats()
+    assert (stats["hits"], stats["revalidated"], stats["misses"]) == (1, 1, 1)
+
+    # A failed revalidation falls back to the cached body
+    monkeypatch.setattr(
+        fetch, "get_session", lambda cfg: FakeSession(lambda url, **kw: MetaResp(503))
+    )
+    stale = Config(rps_limit=0, metadata_ttl_hours=0)
+    assert fetch._metadata("id1", stale)["files"]
+    assert fetch._metadata("id2", stale) is None
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    # refresh-metadata points items at a changed best file
+    db.insert_item("id1", "t", "d", 1, "https://archive.org/download/id1/old.mp4", db_path=db_path)
+    counts = fetch.refresh_metadata(["id1"], cfg)
+    assert counts == {"checked": 1, "updated": 1, "missing": 0}
+    assert db.list_items(db_path=db_path)[0]["url"].endswith("/v.mp4")
+
+
+def test_item_files_drive_selection_and_checksum(monkeypatch, tmp_path):
+    """The file listing is stored, queried for the best file and used to verify."""
+    import hashlib
+
+    db_path = tmp_path / "files.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    body = b"video bytes"
+    files = [
+        {"name": "big.ogv", "format": "Ogg Video", "size": "999"},
+        {"name": "a.mp4", "format": "h.264", "size": str(len(body)),
+         "md5": hashlib.md5(body).hexdigest(), "length": "01:30"},
+        {"name": "b.mp4", "format": "MPEG4", "size": "5", "md5": "0" * 32},
+    ]
+    calls = []
+
+    def fake_get(url, params=None, stream=False, timeout=None, headers=None):
+        calls.append(url)
+        if "advancedsearch" in url:
+            return FakeResponse({"response": {"docs": [{"identifier": "id1", "title": "t"}]}})
+        if "metadata" in url:
+            return FakeResponse({"files": files})
+        return FakeResponse(content=body if url.endswith("a.mp4") else b"corrupt")
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: FakeSession(fake_get))
+
+    cfg = Config(daily_candidates=1, seed_keywords=["x"], rps_limit=0)
+    assert fetch.fetch_candidates(cfg) == ["id1"]
+    assert db.get_item_file("id1", "a.mp4")["duration"] == 90.0
+    assert db.best_item_file("id1", ["ogg"])["name"] == "big.ogv"
+
+    path = fetch.download_item("id1", tmp_path / "dl", cfg)
+    assert path.read_bytes() == body
+    assert not any("metadata" in u for u in calls[2:])
+
+    # Preferring MPEG4 switches files; its checksum does not match
+    db.update_item_file("id1", fetch._download_url("id1", "b.mp4"), 5, db_path=db_path)
+    with pytest.raises(RuntimeError, match="md5 mismatch"):
+        fetch.download_item("id1", tmp_path / "dl", cfg)
+    assert not (tmp_path / "dl" / "id1" / "b.mp4.part").exists()
+
+
+def test_resumed_download_verifies_whole_file(monkeypatch, tmp_path):
+    """The checksum covers the resumed prefix as well as the new bytes."""
+    import hashlib
+
+    db_path = tmp_path / "resume_md5.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+
+    from curator import fetch
+
+    body = b"hello world"
+    url = fetch._download_url("vid5", "m.mp4")
+    db.insert_item("vid5", "t", "d", 1, url, db_path=db_path)
+    db.store_item_files(
+        "vid5",
+        [{"name": "m.mp4", "format": "h.264", "size_bytes": len(body),
+          "md5": hashlib.md5(body).hexdigest(), "sha1": None, "duration": None}],
+        db_path=db_path,
+    )
+    (tmp_path / "vid5").mkdir()
+    (tmp_path / "vid5" / "m.mp4.part").write_bytes(body[:6])
+
+    class RangeResp(FakeResponse):
+        headers = {}
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    monkeypatch.setattr(
+        fetch,
+        "get_session",
+        lambda cfg: FakeSession(lambda u, **kw: RangeResp(content=body[6:], status_code=206)),
+    )
+
+    path = fetch.download_item("vid5", tmp_path, Config(rps_limit=0, download_chunk_kb=1))
+    assert path.read_bytes() == body
+
+
+def test_downloads_return_pooled_connections(monkeypatch, tmp_path):
+    """More downloads than pooled connections finish against a real server."""
+    import http.server
+    import importlib
+    import sys
+    import threading
+
+    from curator import fetch
+
+    # tests/__init__ stubs requests when it is imported first
+    if not hasattr(sys.modules.get("requests"), "Session"):
+        sys.modules.pop("requests", None)
+    requests = importlib.import_module("requests")
+    from requests.adapters import HTTPAdapter
+
+    body = b"x" * 300_000
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path.startswith("/missing"):
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    db_path = tmp_path / "pool.db"
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    db.init_db(db_path)
+    names = [f"missing{i}" for i in range(3)] + [f"v{i}" for i in range(5)]
+    for name in names:
+        db.insert_item(name, "t", "d", 1, f"{base}/{name}.bin", db_path=db_path)
+
+    # Same blocking pool as curator.session, two connections per host
+    pooled = requests.Session()
+    pooled.mount("http://", HTTPAdapter(pool_maxsize=2, pool_block=True))
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: pooled)
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda *a, **k: None)
+    cfg = Config(seed_keywords=[], rps_limit=0, download_chunk_kb=64)
+
+    done = []
+
+    def run():
+        for name in names:
+            try:
+                done.append(fetch.download_item(name, tmp_path, cfg))
+            except Exception as e:
+                done.append(e)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(timeout=20)
+    server.shutdown()
+    pooled.close()
+    assert not worker.is_alive(), "download blocked waiting for a connection"
+    assert all(isinstance(r, Exception) for r in done[:3])
+    assert [p.read_bytes() == body for p in done[3:]] == [True] * 5
@@ -0,0 +1,49 @@
+import os
+import time
+
+from curator.metacache import MetadataCache
+
+
+def test_cache_roundtrip_and_ttl(tmp_path):
+    cache = MetadataCache(tmp_path, ttl_seconds=60, max_bytes=1 << 20)
+    assert cache.get("a") is None
+
+    cache.put("a", {"files": [1, 2]}, etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    entry = cache.get("a")
+    assert entry.body == {"files": [1, 2]}
+    assert cache.is_fresh(entry)
+    assert entry.validators() == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+
+    entry.fetched_at -= 120
+    assert not cache.is_fresh(entry)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = MetadataCache(tmp_path, ttl_seconds=60, max_bytes=1 << 20)
+    blob = {"x": os.urandom(2000).hex()}
+    for key in ("a", "b", "c"):
+        cache.put(key, blob)
+    entry_size = cache._path("a").stat().st_size
+    # Make "a" the oldest, then touch it so "b" becomes least recently used
+    for age, key in ((30, "a"), (20, "b"), (10, "c")):
+        past = time.time() - age
+        os.utime(cache._path(key), (past, past))
+    cache.get("a")
+
+    cache.max_bytes = int(entry_size * 3.5)
+    cache.put("d", blob)
+
+    assert cache.get("b") is None
+    assert all(cache.get(k) is not None for k in ("a", "c", "d"))
+
+
+def test_cache_hit_rate(tmp_path):
+    cache = MetadataCache(tmp_path, ttl_seconds=60, max_bytes=1 << 20)
+    cache.record("hit")
+    cache.record("revalidated")
+    cache.record("miss")
+    cache.record("miss")
+    assert cache.stats()["hit_rate"] == 0.5
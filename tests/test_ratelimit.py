@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+from curator.config import Config
+from curator.ratelimit import RateLimiter, TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_burst_then_spacing():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Queued callers are spaced one interval apart
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+
+def test_bucket_credits_elapsed_time():
+    """Time spent elsewhere (e.g. on the network) is not slept again."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, clock=clock)
+
+    assert bucket.reserve() == 0.0
+    clock.now += 1.5
+    assert bucket.reserve() == 0.0
+    clock.now += 0.25
+    assert bucket.reserve() == 0.75
+
+
+def test_bucket_penalize_and_recover():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=4.0, burst=4, clock=clock)
+
+    bucket.penalize(retry_after=10)
+    assert bucket.rate == 2.0
+    assert bucket.reserve() == 10.0
+
+    for _ in range(20):
+        bucket.reward()
+    assert bucket.rate == 4.0
+
+
+def test_bucket_async():
+    bucket = TokenBucket(rate=1000.0)
+
+    async def run():
+        return await asyncio.gather(*(bucket.acquire_async() for _ in range(5)))
+
+    waits = asyncio.run(run())
+    assert waits[0] == 0.0 and max(waits) > 0
+
+
+def test_unlimited_rate():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.reserve() == 0.0 for _ in range(100))
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("garbage") is None
+    when = "Thu, 01 Jan 1970 00:00:30 GMT"
+    assert parse_retry_after(when, now=10.0) == 20.0
+
+
+def test_limiter_per_host_and_metrics():
+    limiter = RateLimiter(rate=0)
+    assert limiter.bucket("a") is limiter.bucket("a")
+    assert limiter.bucket("a") is not limiter.bucket("b")
+
+    limiter.acquire("a")
+    limiter.observe("a", 429, {"Retry-After": "0"}, elapsed=0.2)
+    limiter.observe("a", 200, {}, elapsed=0.3)
+
+    stats = limiter.stats()
+    assert stats["requests"] == 1
+    assert stats["penalties"] == 1
+    assert abs(stats["network_seconds"] - 0.5) < 1e-9
+
+
+def test_fetch_retries_429(monkeypatch):
+    from curator import fetch
+
+    class Resp:
+        def __init__(self, status):
+            self.status_code = status
+            self.headers = {"Retry-After": "0"}
+
+        def close(self):
+            pass
+
+    statuses = [429, 429, 200]
+    hosts = []
+
+    monkeypatch.setattr(fetch, "_sleep_for_rps", lambda rps, host: hosts.append(host))
+    session = SimpleNamespace(get=lambda url, **kw: Resp(statuses.pop(0)))
+    monkeypatch.setattr(fetch, "get_session", lambda cfg: session)
+
+    res = fetch._get("https://example.org/x", Config(rps_limit=0))
+
+    assert res.status_code == 200
+    assert hosts == ["example.org"] * 3
@@ -21,11 +21,11 @@ class DummyModel:
     def __init__(self, vectors):
         self.vectors = vectors
 
-    def encode(self, text, convert_to_numpy=True, normalize_embeddings=True):
-        vec = np.array(self.vectors[text], dtype=float)
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        vecs = np.array([self.vectors[t] for t in texts], dtype=float)
         if normalize_embeddings:
-            vec = vec / np.linalg.norm(vec)
-        return vec
+            vecs = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs
 
     def get_sentence_embedding_dimension(self):
         # all vectors are 2-dim
@@ -80,3 +80,280 @@ def test_recommend_order(monkeypatch, tmp_path):
     recs = recommend.recommend(3)
     ids = [row["id"] for row in recs]
     assert ids == ["id1", "id3", "id2"]
+
+
+class CountingModel(DummyModel):
+    def __init__(self, vectors):
+        super().__init__(vectors)
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        self.calls += len(texts)
+        return super().encode(texts, convert_to_numpy, normalize_embeddings)
+
+
+def test_recommend_reuses_stored_embeddings(monkeypatch, tmp_path):
+    db_path = setup_rec_db(tmp_path, monkeypatch)
+
+    db.insert_item("id1", "id1", "", 1, "url1", db_path=db_path)
+    db.insert_item("id2", "id2", "", 1, "url2", db_path=db_path)
+    db.record_rating("id1", 8, db_path=db_path)
+
+    vectors = {"id1": [1, 0], "id2": [0, 1], "id2 changed": [1, 1]}
+    from curator import recommend
+
+    model = CountingModel(vectors)
+    monkeypatch.setattr(recommend, "_model", model)
+
+    recommend.recommend(2)
+    assert model.calls == 2
+
+    # Nothing changed, so nothing is re-encoded
+    recommend.recommend(2)
+    assert model.calls == 2
+
+    # Replacing a row with new text invalidates only that vector
+    db.insert_item("id2", "id2", "changed", 1, "url2", db_path=db_path)
+    recommend.recommend(2)
+    assert model.calls == 3
+
+    assert recommend.reindex() == 2
+    assert model.calls == 5
+
+
+def test_recommend_keeps_vectors_in_memory(monkeypatch, tmp_path):
+    db_path = setup_rec_db(tmp_path, monkeypatch)
+    db.insert_item("id1", "id1", "", 1, "url1", db_path=db_path)
+    db.insert_item("id2", "id2", "", 1, "url2", db_path=db_path)
+    db.record_rating("id1", 8, db_path=db_path)
+
+    from curator import recommend
+
+    vectors = {"id1": [1, 0], "id2": [0, 1], "id3": [1, 1]}
+    monkeypatch.setattr(recommend, "_model", CountingModel(vectors))
+    loads = []
+    orig_load = recommend._load_matrix
+    monkeypatch.setattr(
+        recommend, "_load_matrix", lambda *a: loads.append(a) or orig_load(*a)
+    )
+
+    assert [r["id"] for r in recommend.recommend(2)] == ["id1", "id2"]
+    db.record_rating("id2", 9, db_path=db_path)
+    assert [r["id"] for r in recommend.recommend(2)] == ["id2", "id1"]
+    assert len(loads) == 1
+
+    db.insert_item("id3", "id3", "", 1, "url3", db_path=db_path)
+    assert len(recommend.recommend(3)) == 3
+    assert len(loads) == 2
+
+    with db.get_connection(db_path) as conn:
+        conn.execute("DELETE FROM items WHERE id = 'id3'")
+    assert [r["id"] for r in recommend.recommend(3)] == ["id2", "id1"]
+    assert len(loads) == 3
+
+
+def test_embed_batches_streams_in_batches(monkeypatch):
+    from curator import recommend
+
+    vectors = {f"t{i}": [i + 1, 1] for i in range(5)}
+    model = CountingModel(vectors)
+    monkeypatch.setattr(recommend, "_model", model)
+
+    batches = list(recommend.embed_batches((f"t{i}" for i in range(5)), batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert all(b.dtype == np.float32 for b in batches)
+
+    matrix = recommend.embed_many([f"t{i}" for i in range(5)], batch_size=4)
+    assert matrix.shape == (5, 2)
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-6)
+
+
+def test_top_indices_matches_full_sort():
+    from curator import recommend
+
+    rng = np.random.default_rng(0)
+    scores = rng.standard_normal(1000).astype(np.float32)
+
+    top = recommend._top_indices(scores, 10)
+    assert list(top) == list(np.argsort(-scores)[:10])
+    assert len(recommend._top_indices(scores, 5000)) == 1000
+    assert len(recommend._top_indices(scores, 0)) == 0
+
+
+def test_recommend_uses_ivf_above_threshold(monkeypatch, tmp_path):
+    db_path = setup_rec_db(tmp_path, monkeypatch)
+
+    db.insert_item("id1", "id1", "", 1, "url1", db_path=db_path)
+    db.insert_item("id2", "id2", "", 1, "url2", db_path=db_path)
+    db.insert_item("id3", "id3", "", 1, "url3", db_path=db_path)
+    db.record_rating("id1", 8, db_path=db_path)
+    db.record_rating("id2", 4, db_path=db_path)
+
+    vectors = {"id1": [1, 0], "id2": [0, 1], "id3": [0.2, 0.8], "id4": [1, 0.1]}
+    from curator import ann, recommend
+    from curator.config import Config
+
+    monkeypatch.setattr(recommend, "_model", DummyModel(vectors))
+    cfg = Config(ann_threshold=2, ann_nlist=2, ann_nprobe=2)
+
+    recs = recommend.recommend(3, cfg)
+    assert [row["id"] for row in recs] == ["id1", "id3", "id2"]
+    assert ann.index_path().exists()
+
+    # New items are added to the existing index incrementally
+    db.insert_item("id4", "id4", "", 1, "url4", db_path=db_path)
+    recs = recommend.recommend(2, cfg)
+    assert [row["id"] for row in recs] == ["id4", "id1"]
+    assert len(ann.load_index(recommend.MODEL)) == 4
+
+
+def _stored_preference(recommend):
+    row = db.get_preference(recommend.MODEL)
+    return np.frombuffer(row["vector"], dtype=np.float32), row["weight"]
+
+
+def _check_incremental_matches_rebuild(monkeypatch, tmp_path, half_life):
+    db_path = setup_rec_db(tmp_path, monkeypatch)
+    vectors = {
+        "id1": [1, 0],
+        "id2": [0, 1],
+        "id3": [0.2, 0.8],
+        "id3 new": [0.9, 0.1],
+    }
+    from curator import recommend
+    from curator.config import Config
+
+    monkeypatch.setattr(recommend, "_model", DummyModel(vectors))
+    cfg = Config(preference_half_life_days=half_life)
+    backend = recommend.get_backend(cfg)
+
+    db.insert_item("id1", "id1", "", 1, "url1", db_path=db_path)
+    db.insert_item("id2", "id2", "", 1, "url2", db_path=db_path)
+    db.record_rating("id1", 8, rated_at="2024-01-01 00:00:00", db_path=db_path)
+    recommend.recommend(2, cfg)
+
+    # Updates applied one rating at a time, without a rebuild
+    db.record_rating("id2", 4, rated_at="2024-01-05 00:00:00", db_path=db_path)
+    db.record_rating("id1", 2, rated_at="2024-01-09 00:00:00", db_path=db_path)
+    db.insert_item("id3", "id3", "", 1, "url3", db_path=db_path)
+    db.record_rating("id3", 9, rated_at="2024-01-10 00:00:00", db_path=db_path)
+    recommend.index_items(recommend._missing_items(backend), cfg)
+    db.insert_item("id3", "id3", "new", 1, "url3", db_path=db_path)
+    recommend.index_items(recommend._missing_items(backend), cfg)
+    db.record_rating("id2", 7, rated_at="2024-01-03 00:00:00", db_path=db_path)
+    incremental, weight = _stored_preference(recommend)
+
+    recommend._rebuild_preference(backend, 2, half_life)
+    rebuilt, rebuilt_weight = _stored_preference(recommend)
+    np.testing.assert_allclose(incremental, rebuilt, rtol=1e-5, atol=1e-6)
+    assert abs(weight - rebuilt_weight) < 1e-6
+
+
+def test_preference_updates_incrementally(monkeypatch, tmp_path):
+    _check_incremental_matches_rebuild(monkeypatch, tmp_path, 0.0)
+
+
+def test_preference_decay_updates_incrementally(monkeypatch, tmp_path):
+    _check_incremental_matches_rebuild(monkeypatch, tmp_path, 3.0)
+
+
+def test_recommend_skips_ratings_table_when_preference_stored(monkeypatch, tmp_path):
+    db_path = setup_rec_db(tmp_path, monkeypatch)
+    vectors = {"id1": [1, 0], "id2": [0, 1]}
+    from curator import recommend
+
+    monkeypatch.setattr(recommend, "_model", DummyModel(vectors))
+    db.insert_item("id1", "id1", "", 1, "url1", db_path=db_path)
+    db.insert_item("id2", "id2", "", 1, "url2", db_path=db_path)
+    db.record_rating("id2", 9, db_path=db_path)
+    recommend.recommend(1)
+
+    rebuilds = []
+    monkeypatch.setattr(recommend, "_rebuild_preference", lambda *a: rebuilds.append(a))
+    db.record_rating("id1", 10, db_path=db_path)
+    db.record_rating("id1", 10, db_path=db_path)
+    recs = recommend.recommend(1)
+    assert [row["id"] for row in recs] == ["id1"]
+    assert rebuilds == []
+
+
+def test_hashing_backend_is_deterministic_and_normalized():
+    from curator import recommend
+
+    backend = recommend.HashingBackend(dim=64)
+    texts = ["funny cat video", "funny cat videos", "tax law lecture", ""]
+    vecs = backend.encode(texts)
+
+    assert vecs.shape == (4, 64) and vecs.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vecs[:3], axis=1), 1.0, rtol=1e-6)
+    assert not vecs[3].any()
+    np.testing.assert_array_equal(vecs, backend.encode(texts))
+    assert vecs[0] @ vecs[1] > vecs[0] @ vecs[2]
+
+
+def test_backend_switch_reindexes_with_float16(monkeypatch, tmp_path):
+    db_path = setup_rec_db(tmp_path, monkeypatch)
+    vectors = {"id1 cats": [1, 0], "id2 law": [0, 1]}
+    from curator import recommend
+    from curator.config import Config
+
+    monkeypatch.setattr(recommend, "_model", DummyModel(vectors))
+    db.insert_item("id1", "id1", "cats", 1, "url1", db_path=db_path)
+    db.insert_item("id2", "id2", "law", 1, "url2", db_path=db_path)
+    db.record_rating("id1", 9, db_path=db_path)
+    recommend.recommend(2)
+
+    cfg = Config(embedding_backend="hashing", embedding_dim=32, embedding_dtype="float16")
+    backend = recommend.get_backend(cfg)
+    assert backend.key == "hashing-32:float16"
+
+    recs = recommend.recommend(2, cfg)
+    assert [row["id"] for row in recs] == ["id1", "id2"]
+    rows = db.get_embeddings(backend.key, db_path=db_path)
+    assert len(rows) == 2 and all(len(row["vector"]) == 64 for row in rows)
+    assert db.get_embeddings(recommend.MODEL, db_path=db_path) == []
+
+    # Incremental preference updates decode float16 item vectors
+    db.record_rating("id2", 3, db_path=db_path)
+    incremental = np.frombuffer(db.get_preference(backend.key)["vector"], np.float32)
+    recommend._rebuild_preference(backend, 32, 0.0)
+    rebuilt = np.frombuffer(db.get_preference(backend.key)["vector"], np.float32)
+    np.testing.assert_allclose(incremental, rebuilt, rtol=1e-5, atol=1e-6)
+
+
+def test_cache_is_stale_after_backend_or_decay_change(monkeypatch, tmp_path):
+    db_path = setup_rec_db(tmp_path, monkeypatch)
+    from curator import recommend
+    from curator.config import Config
+
+    db.insert_item("id1", "cats", "kittens", 1, "url1", db_path=db_path)
+    db.insert_item("id2", "law", "courts", 1, "url2", db_path=db_path)
+    db.record_rating("id1", 9, db_path=db_path)
+    snapshot = tmp_path / "rec.recs.json"
+    calls = []
+    orig = recommend.recommend
+    monkeypatch.setattr(
+        recommend, "recommend", lambda n, cfg=None: calls.append(cfg) or orig(n, cfg)
+    )
+
+    base = Config(embedding_backend="hashing", embedding_dim=384)
+    recommend.RecommendationCache(5, base, snapshot).get(2)
+    # Same settings: served from the snapshot
+    recommend.RecommendationCache(5, base, snapshot).get(2)
+    assert len(calls) == 1
+
+    small = Config(embedding_backend="hashing", embedding_dim=64)
+    cache = recommend.RecommendationCache(5, small, snapshot)
+    cache.get(2)
+    assert len(calls) == 2
+    assert db.get_meta("embedding_model") == "hashing-64"
+    # A stale list from another backend is not served while refreshing
+    cache.cfg = Config(embedding_backend="hashing", embedding_dim=32)
+    cache.get(2, allow_stale=True)
+    assert len(calls) == 3 and cache._thread is None
+
+    decayed = Config(
+        embedding_backend="hashing", embedding_dim=32, preference_half_life_days=30
+    )
+    recommend.RecommendationCache(5, decayed, snapshot).get(2)
+    assert len(calls) == 4
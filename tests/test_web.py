@@ -1,4 +1,14 @@
+import importlib
+import sys
+import numpy as np
+
+# Reload real modules if tests/__init__ provided stubs
+if not hasattr(np, "__file__"):
+    sys.modules.pop("numpy", None)
+    np = importlib.import_module("numpy")
+
 from curator import db
+from curator.config import Config
 from curator.web import create_app
 
 
@@ -56,3 +66,89 @@ def test_web_index_lists_items(monkeypatch, tmp_path):
         assert "desc2" in html
         assert "title3" in html
         assert "desc3" in html
+
+
+def test_web_index_shows_rating_stats(monkeypatch, tmp_path):
+    setup_web_db(tmp_path, monkeypatch)
+    db.record_rating("vid1", 6)
+    db.record_rating("vid1", 9)
+
+    app = create_app()
+    with app.test_client() as client:
+        html = client.get("/").data.decode()
+    assert "Rated 7.5 (2)" in html
+
+
+class DummyModel:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        vecs = np.array([self.vectors[t] for t in texts], dtype=float)
+        return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def test_web_recommend_served_from_cache(monkeypatch, tmp_path):
+    db_path = setup_web_db(tmp_path, monkeypatch)
+    db.insert_item("vid2", "title2", "desc2", 10, "url2", db_path=db_path)
+
+    from curator import recommend
+
+    vectors = {"title desc": [1, 0], "title2 desc2": [0, 1]}
+    monkeypatch.setattr(recommend, "_model", DummyModel(vectors))
+    calls = []
+    orig_recommend = recommend.recommend
+    monkeypatch.setattr(
+        recommend,
+        "recommend",
+        lambda top_n, cfg=None: calls.append(top_n) or orig_recommend(top_n, cfg),
+    )
+
+    app = create_app(Config(recommend_cache_size=20))
+    cache = app.extensions["recommendations"]
+    with app.test_client() as client:
+        resp = client.get("/recommend")
+        assert resp.status_code == 200
+        assert "Recommended" in resp.data.decode()
+        assert "title2" in resp.data.decode()
+        client.get("/recommend?n=2")
+        assert calls == [20]
+
+        # A rating bumps the data version and refreshes in the background
+        version = db.data_version()
+        resp = client.post("/rate/vid2/9")
+        assert resp.status_code == 200
+        assert db.data_version() > version
+        cache._thread.join()
+        assert calls == [20, 20]
+        client.get("/recommend")
+        assert calls == [20, 20]
+
+    assert recommend.snapshot_path().is_file()
+
+
+def test_web_search_highlights_and_pages(monkeypatch, tmp_path):
+    db_path = setup_web_db(tmp_path, monkeypatch)
+    from curator import web
+
+    monkeypatch.setattr(web, "SEARCH_PAGE_SIZE", 1)
+    db.insert_item("vid2", "<b>Space</b> race", "desc2", 10, "url2", db_path=db_path)
+    db.insert_item("vid3", "space walk", "desc3", 10, "url3", db_path=db_path)
+
+    app = create_app()
+    with app.test_client() as client:
+        first = client.get("/search?q=space").data.decode()
+        assert "page=2" in first
+        second = client.get("/search?q=space&page=2").data.decode()
+        assert "page=3" not in second
+        pages = first + second
+        assert "&lt;b&gt;<mark>Space</mark>&lt;/b&gt; race" in pages
+        assert "<mark>space</mark> walk" in pages
+        assert "No matches" in client.get("/search?q=zebra").data.decode()
+        assert "Too many matches" not in first
+
+        # Past the ranked window the page says so instead of "No matches"
+        monkeypatch.setattr(db, "SEARCH_CANDIDATES", 1)
+        capped = client.get("/search?q=space&page=3").data.decode()
+        assert "Too many matches" in capped
+        assert "No matches" not in capped
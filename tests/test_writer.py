@@ -0,0 +1,67 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from curator.writer import StreamWriter, preallocate
+
+
+class RawResponse:
+    """Response exposing the ``http.client`` body under ``raw._fp``."""
+
+    def __init__(self, data):
+        self.headers = {}
+        self.raw = type("Raw", (), {"_fp": io.BytesIO(data)})()
+
+
+class ChunkResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def iter_content(self, chunk_size=8192):
+        yield from self.chunks
+
+
+@pytest.mark.parametrize("depth", [1, 4])
+def test_copy_hashes_inline(tmp_path, depth):
+    data = os.urandom(100_000)
+    md5 = hashlib.md5()
+    with (tmp_path / "out").open("wb") as f:
+        writer = StreamWriter(f, chunk_size=4096, hashers=[md5], depth=depth)
+        assert writer.copy(RawResponse(data)) == len(data)
+    assert (tmp_path / "out").read_bytes() == data
+    assert md5.hexdigest() == hashlib.md5(data).hexdigest()
+
+
+def test_copy_iter_content_fallback_splits_large_chunks(tmp_path):
+    sizes = []
+    with (tmp_path / "out").open("wb") as f:
+        writer = StreamWriter(f, chunk_size=4)
+        writer.copy(ChunkResponse([b"abcdefghij", b"kl"]), before_write=sizes.append)
+    assert (tmp_path / "out").read_bytes() == b"abcdefghijkl"
+    assert sizes == [4, 4, 2, 2]
+
+
+def test_abort_keeps_written_count(tmp_path):
+    def stop_after_two(n, seen=[]):
+        seen.append(n)
+        if len(seen) > 2:
+            raise RuntimeError("stop")
+
+    with (tmp_path / "out").open("wb") as f:
+        writer = StreamWriter(f, chunk_size=10, hashers=[hashlib.sha1()])
+        with pytest.raises(RuntimeError):
+            writer.copy(RawResponse(b"x" * 100), before_write=stop_after_two)
+    assert writer.written == 20
+    assert (tmp_path / "out").stat().st_size == 20
+
+
+def test_preallocate_then_truncate(tmp_path):
+    with (tmp_path / "out").open("wb") as f:
+        if not preallocate(f, 0, 1 << 20):
+            pytest.skip("posix_fallocate unavailable")
+        assert os.fstat(f.fileno()).st_size == 1 << 20
+        f.write(b"abc")
+        f.truncate(3)
+    assert (tmp_path / "out").read_bytes() == b"abc"